@@ -0,0 +1,302 @@
+# api.py
+# Headless HTTP API over service.py.
+#   uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import telemetry
+from backends import BACKEND, BACKENDS, create_backend
+from dispatcher import DeadlineExceeded, get_dispatcher
+from jobs import ACTIVE, JobQueue
+from response_cache import default_cache
+from service import GenAIService
+from singleflight import get_singleflight
+
+load_dotenv()
+
+_service = None
+_jobs = None
+JOB_POLL_SECONDS = 0.5
+
+
+def get_service():
+    global _service
+    if _service is None:
+        api_key = os.getenv("GEMINI_API_KEY")
+        if BACKENDS[BACKEND].needs_api_key and not api_key:
+            raise RuntimeError("GEMINI_API_KEY is not set")
+        backend = create_backend(BACKEND, api_key=api_key) if BACKEND == "gemini" else create_backend(BACKEND)
+        _service = GenAIService(backend)
+    return _service
+
+
+def get_jobs():
+    global _jobs
+    if _jobs is None:
+        _jobs = JobQueue(get_service())
+    return _jobs
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError("Request body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Request body must be a JSON object")
+    return body
+
+
+def endpoint(handler):
+    # Maps service errors to HTTP statuses; blocking service calls run in the thread pool
+    async def wrapped(request):
+        try:
+            return await handler(request)
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        except DeadlineExceeded as e:
+            return JSONResponse({"error": str(e)}, status_code=504)
+        except Exception as e:
+            return JSONResponse({"error": f"{type(e).__name__}: {e}"}, status_code=502)
+
+    return wrapped
+
+
+# ---------------------------
+# Endpoints
+# ---------------------------
+@endpoint
+async def sentiment(request):
+    body = await _json_body(request)
+    return JSONResponse(await run_in_threadpool(get_service().sentiment, body.get("text")))
+
+
+@endpoint
+async def sentiment_batch(request):
+    body = await _json_body(request)
+    return JSONResponse({"results": await run_in_threadpool(get_service().sentiment_batch, body.get("texts"))})
+
+
+@endpoint
+async def generate(request):
+    body = await _json_body(request)
+    service = get_service()
+    args = (body.get("prompt"), body.get("tone", "Professional"), body.get("length", "Medium"))
+    if body.get("stream"):
+        chunks = await run_in_threadpool(service.generate_stream, *args)
+        return StreamingResponse(iterate_in_threadpool(chunks), media_type="text/plain; charset=utf-8")
+    return JSONResponse(await run_in_threadpool(service.generate, *args))
+
+
+@endpoint
+async def generate_batch(request):
+    body = await _json_body(request)
+    return JSONResponse({"results": await run_in_threadpool(get_service().generate_batch, body.get("items"))})
+
+
+@endpoint
+async def chat(request):
+    # One conversation turn; omit session_id to start a new session. Streams carry it in X-Chat-Session.
+    body = await _json_body(request)
+    service = get_service()
+    args = (body.get("message"), body.get("session_id"), body.get("tone", "Professional"),
+            body.get("length", "Medium"), body.get("context"))
+    if body.get("stream"):
+        session_id, chunks = await run_in_threadpool(service.chat_stream, *args)
+        return StreamingResponse(iterate_in_threadpool(chunks), media_type="text/plain; charset=utf-8",
+                                 headers={"X-Chat-Session": session_id})
+    return JSONResponse(await run_in_threadpool(service.chat, *args))
+
+
+@endpoint
+async def chat_reset(request):
+    return JSONResponse({"reset": get_service().chat_reset(request.path_params["session_id"])})
+
+
+@endpoint
+async def translate(request):
+    body = await _json_body(request)
+    result = await run_in_threadpool(
+        get_service().translate,
+        body.get("text"),
+        body.get("source_lang", "Auto Detect"),
+        body.get("target_lang", "English"),
+    )
+    return JSONResponse(result)
+
+
+@endpoint
+async def translate_batch(request):
+    body = await _json_body(request)
+    return JSONResponse({"results": await run_in_threadpool(get_service().translate_batch, body.get("items"))})
+
+
+@endpoint
+async def translate_multi(request):
+    body = await _json_body(request)
+    result = await run_in_threadpool(
+        get_service().translate_multi,
+        body.get("text"),
+        body.get("source_lang", "Auto Detect"),
+        body.get("target_langs"),
+    )
+    return JSONResponse(result)
+
+
+@endpoint
+async def translate_document(request):
+    body = await _json_body(request)
+    result = await run_in_threadpool(
+        get_service().translate_document,
+        body.get("text"),
+        body.get("source_lang", "Auto Detect"),
+        body.get("target_lang", "English"),
+    )
+    return JSONResponse(result)
+
+
+@endpoint
+async def speech(request):
+    body = await _json_body(request)
+    audio = await run_in_threadpool(get_service().speech, body.get("text"), body.get("target_lang", "English"))
+    return Response(audio, media_type="audio/mpeg")
+
+
+@endpoint
+async def voice_translate(request):
+    # Raw audio body; options in the query string. Results stream back as JSON lines, one per segment.
+    data = await request.body()
+    params = request.query_params
+    segments = get_service().voice_translate(
+        data,
+        params.get("filename", "upload.wav"),
+        params.get("source_lang", "Auto Detect"),
+        params.get("target_lang", "English"),
+    )
+    first = await run_in_threadpool(next, segments, None)
+
+    async def lines():
+        if first is not None:
+            yield json.dumps(first, ensure_ascii=False) + "\n"
+        async for segment in iterate_in_threadpool(segments):
+            yield json.dumps(segment, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@endpoint
+async def voice_job(request):
+    # Same input as /v1/voice-translate, run as a background job; resubmitting the same upload resumes it
+    data = await request.body()
+    params = request.query_params
+    job_id = await run_in_threadpool(
+        get_jobs().submit_voice, data, params.get("filename", "upload.wav"),
+        params.get("source_lang", "Auto Detect"), params.get("target_lang", "English"),
+    )
+    return JSONResponse({"job_id": job_id}, status_code=202)
+
+
+@endpoint
+async def sentiment_job(request):
+    body = await _json_body(request)
+    job_id = await run_in_threadpool(get_jobs().submit_sentiment_batch, body.get("texts"))
+    return JSONResponse({"job_id": job_id}, status_code=202)
+
+
+@endpoint
+async def job_status(request):
+    # Status plus the items finished after index ?after= (default: all of them)
+    after = int(request.query_params.get("after", -1))
+    job = await run_in_threadpool(get_jobs().status, request.path_params["job_id"], after)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return JSONResponse(job)
+
+
+@endpoint
+async def job_events(request):
+    # JSON lines: each finished item as it lands, then the final job status
+    jobs, job_id = get_jobs(), request.path_params["job_id"]
+    if await run_in_threadpool(jobs.status, job_id) is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+
+    async def lines():
+        # Follows write order, not index order: items re-run on resume are sent again with their new result
+        cursor = -1
+        while True:
+            job = await run_in_threadpool(jobs.changes, job_id, cursor)
+            cursor = job.pop("cursor")
+            for item in job.pop("items"):
+                yield json.dumps({"item": item}, ensure_ascii=False) + "\n"
+            if job["status"] not in ACTIVE:
+                yield json.dumps({"job": job}, ensure_ascii=False) + "\n"
+                return
+            await asyncio.sleep(JOB_POLL_SECONDS)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@endpoint
+async def memory_export(request):
+    memory = get_service().memory
+    params = request.query_params
+    langs = (params.get("source_lang"), params.get("target_lang"))
+    if params.get("format", "jsonl") == "tmx":
+        return Response(await run_in_threadpool(memory.export_tmx, *langs), media_type="application/x-tmx+xml")
+    return Response(await run_in_threadpool(memory.export_jsonl, *langs), media_type="application/x-ndjson")
+
+
+@endpoint
+async def memory_import(request):
+    # Raw TMX or JSONL body; ?format=tmx|jsonl
+    memory = get_service().memory
+    data = await request.body()
+    load = memory.import_tmx if request.query_params.get("format", "jsonl") == "tmx" else memory.import_jsonl
+    return JSONResponse({"imported": await run_in_threadpool(load, data), "stats": memory.stats()})
+
+
+async def health(request):
+    return JSONResponse({"status": "ok", "backend": BACKEND, "dispatcher": get_dispatcher().stats(),
+                         "cache": default_cache().stats(), "singleflight": get_singleflight().stats(),
+                         "chat": _service and {"sessions": len(_service.chats),
+                                               "context_caches": _service.context_caches.stats()}})
+
+
+async def metrics(request):
+    return Response(telemetry.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+routes = [
+    Route("/healthz", health, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+    Route("/v1/sentiment", sentiment, methods=["POST"]),
+    Route("/v1/sentiment/batch", sentiment_batch, methods=["POST"]),
+    Route("/v1/generate", generate, methods=["POST"]),
+    Route("/v1/generate/batch", generate_batch, methods=["POST"]),
+    Route("/v1/chat", chat, methods=["POST"]),
+    Route("/v1/chat/{session_id}", chat_reset, methods=["DELETE"]),
+    Route("/v1/translate", translate, methods=["POST"]),
+    Route("/v1/translate/batch", translate_batch, methods=["POST"]),
+    Route("/v1/translate/multi", translate_multi, methods=["POST"]),
+    Route("/v1/translate/document", translate_document, methods=["POST"]),
+    Route("/v1/speech", speech, methods=["POST"]),
+    Route("/v1/voice-translate", voice_translate, methods=["POST"]),
+    Route("/v1/jobs/voice", voice_job, methods=["POST"]),
+    Route("/v1/jobs/sentiment-batch", sentiment_job, methods=["POST"]),
+    Route("/v1/jobs/{job_id}", job_status, methods=["GET"]),
+    Route("/v1/jobs/{job_id}/events", job_events, methods=["GET"]),
+    Route("/v1/translation-memory", memory_export, methods=["GET"]),
+    Route("/v1/translation-memory", memory_import, methods=["POST"]),
+]
+
+app = Starlette(routes=routes)
@@ -1,67 +1,21 @@
 # app.py
+import json
+import sys
+import time
 import streamlit as st
-import os
-from dotenv import load_dotenv
-from google import genai
-import speech_recognition as sr
-from pydub import AudioSegment
-from gtts import gTTS
-import tempfile
+import sentiment as sentiment_api
+from backends import BACKEND, BACKENDS
+from dispatcher import get_dispatcher
+from generation import LENGTHS, TONES
+from jobs import ACTIVE
+from languages import EXAMPLE_TEXTS, LANGUAGE_NAMES, DEFAULT_TARGET_INDEX, POPULAR_TARGETS
+from resources import (RerunTimer, get_api_key, get_jobs, get_prefetcher, get_service, load_css, render_rerun_report,
+                       render_telemetry, render_token_count, session_telemetry, start_metrics)
+from response_cache import default_cache
+from sentiment_local import get_classifier
+from singleflight import get_singleflight
 
-# ---------------------------
-# Language mapping
-# ---------------------------
-LANGUAGES = {
-    "Auto Detect": None,
-    "English": "en",
-    "Telugu": "te",
-    "Hindi": "hi",
-    "Spanish": "es",
-    "French": "fr",
-    "German": "de",
-    "Portuguese": "pt",
-    "Russian": "ru",
-    "Italian": "it",
-    "Dutch": "nl",
-    "Bengali": "bn",
-    "Urdu": "ur",
-    "Arabic": "ar",
-    "Punjabi": "pa",
-    "Tamil": "ta",
-    "Kannada": "kn",
-    "Malayalam": "ml",
-    "Marathi": "mr",
-    "Gujarati": "gu",
-    "Odia": "or",
-    "Nepali": "ne",
-    "Sinhala": "si",
-    "Vietnamese": "vi",
-    "Thai": "th",
-    "Indonesian": "id",
-    "Malay": "ms",
-    "Swahili": "sw",
-    "Polish": "pl",
-    "Czech": "cs",
-    "Romanian": "ro",
-    "Hungarian": "hu",
-    "Greek": "el",
-    "Turkish": "tr",
-    "Korean": "ko",
-    "Japanese": "ja",
-    "Chinese (Simplified)": "zh-CN",
-    "Chinese (Traditional)": "zh-TW",
-}
-
-# ---------------------------
-# Load API key
-# ---------------------------
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    st.error("GEMINI_API_KEY not found in .env — add GEMINI_API_KEY=your_key and restart.")
-    st.stop()
-
-client = genai.Client(api_key=API_KEY)
+timer = RerunTimer()
 
 st.set_page_config(
     page_title="Simple GenAI App",
@@ -71,117 +25,25 @@ st.set_page_config(
 )
 
 # ---------------------------
-# DARK MODE CSS - Always dark
+# Load API key
 # ---------------------------
-st.markdown("""
-<style>
-/* Make sidebar always visible and nice */
-[data-testid="stSidebar"] {
-    background-color: #1e293b;
-    padding: 20px;
-    min-width: 250px !important;
-}
-
-/* Main app dark theme */
-.stApp {
-    background-color: #0f172a !important;
-    color: #e2e8f0 !important;
-}
-
-/* Main content area */
-.main .block-container {
-    padding-top: 2rem;
-    padding-bottom: 2rem;
-}
-
-/* Cards for better UI */
-.card {
-    background: #1e293b;
-    border-radius: 10px;
-    padding: 20px;
-    box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1);
-    margin-bottom: 20px;
-    border: 1px solid #334155;
-    color: #e2e8f0;
-}
-
-/* Buttons */
-.stButton > button {
-    background-color: #3b82f6;
-    color: white;
-    border: none;
-    padding: 12px 24px;
-    border-radius: 8px;
-    font-weight: 600;
-    width: 100%;
-    transition: all 0.3s;
-}
-
-.stButton > button:hover {
-    background-color: #2563eb;
-    transform: translateY(-2px);
-    box-shadow: 0 4px 12px rgba(37, 99, 235, 0.3);
-}
-
-/* Text areas */
-.stTextArea textarea {
-    border-radius: 10px;
-    border: 2px solid #475569;
-    font-size: 16px;
-    padding: 15px;
-    background-color: #1e293b;
-    color: #e2e8f0;
-}
-
-.stTextArea textarea:focus {
-    border-color: #3b82f6;
-    box-shadow: 0 0 0 3px rgba(59, 130, 246, 0.1);
-}
-
-/* Radio buttons in sidebar */
-[data-testid="stSidebar"] .stRadio > div {
-    flex-direction: column;
-    gap: 10px;
-}
-
-[data-testid="stSidebar"] .stRadio label {
-    padding: 12px 15px;
-    border-radius: 8px;
-    border: 2px solid #475569;
-    margin-bottom: 8px;
-    cursor: pointer;
-    transition: all 0.3s;
-    width: 100% !important;
-    display: block !important;
-    background-color: #334155;
-    color: #e2e8f0;
-}
-
-[data-testid="stSidebar"] .stRadio label:hover {
-    border-color: #3b82f6;
-    background-color: #475569;
-}
-
-[data-testid="stSidebar"] .stRadio input:checked + label {
-    background-color: #3b82f6;
-    color: white;
-    border-color: #3b82f6;
-}
+with timer.stage("api_key"):
+    API_KEY = get_api_key()
+if not API_KEY and BACKENDS[BACKEND].needs_api_key:
+    st.error("GEMINI_API_KEY not found in .env — add GEMINI_API_KEY=your_key and restart.")
+    st.stop()
 
-/* Hide default Streamlit elements we don't need */
-#MainMenu {visibility: hidden;}
-footer {visibility: hidden;}
+# Token usage, cost and stage timings accumulate per browser session
+usage = session_telemetry()
+start_metrics()
 
-/* Make all text white in sidebar */
-[data-testid="stSidebar"] h1,
-[data-testid="stSidebar"] h2,
-[data-testid="stSidebar"] h3,
-[data-testid="stSidebar"] p,
-[data-testid="stSidebar"] div {
-    color: #e2e8f0 !important;
-}
-</style>
-""", unsafe_allow_html=True)
+# ---------------------------
+# DARK MODE CSS - Always dark
+# ---------------------------
+# Streamlit drops elements that are not re-emitted, so the style tag is sent every
+# rerun; only the file read and string assembly are cached.
+with timer.stage("css"):
+    st.markdown(load_css(), unsafe_allow_html=True)
 
 # ---------------------------
 # SIDEBAR - Always Dark Mode
@@ -220,10 +82,143 @@ with st.sidebar:
     st.markdown("---")
     
     # API status
-    if API_KEY:
+    if BACKEND == "fake":
+        st.warning("⚠ Offline fake backend")
+    elif API_KEY:
         st.success("✓ API Connected")
     else:
         st.error("✗ API Error")
+    render_telemetry(usage)
+    
+    # Response cache
+    cache_stats = default_cache().stats()
+    st.caption(
+        f"Cache: {cache_stats['memory_hits'] + cache_stats['disk_hits']} hits · "
+        f"{cache_stats['misses']} misses · {cache_stats['hit_rate']:.0%} hit rate"
+    )
+    # tts is only in sys.modules once something was synthesized; the sidebar must not be what loads it
+    tts_module = sys.modules.get("tts")
+    tts_stats = tts_module.cache_stats() if tts_module is not None else None
+    if tts_stats:
+        st.caption(f"TTS cache: {tts_stats['memory_hits'] + tts_stats['disk_hits']} hits · {tts_stats['misses']} misses")
+    local_stats = get_classifier().stats()
+    st.caption(
+        f"Local sentiment: {local_stats['local']} answered · "
+        f"{local_stats['escalation_rate']:.0%} escalated (threshold {local_stats['threshold']:g})"
+    )
+    
+    dispatch_stats = get_dispatcher().stats()
+    st.caption(
+        f"Requests: {dispatch_stats['in_flight']}/{dispatch_stats['max_concurrency']} in flight · "
+        f"{dispatch_stats['retries']} retries · {dispatch_stats['failures']} failed · "
+        f"{get_singleflight().stats()['suppressed']} coalesced"
+    )
+
+# The sidebar renders before the client is built, so a cold process shows it straight away.
+# One client (and its pooled HTTP connections) per process, not per rerun;
+# the UI is a thin layer over the same service the HTTP API uses.
+with timer.stage("client"):
+    service = get_service(API_KEY)
+
+with st.sidebar:
+    render_rerun_report(timer)
+
+
+def show_voice_job(job):
+    items = job["items"]
+    target_lang = job["params"]["target_lang"]
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    col_t, col_r = st.columns(2)
+    with col_t:
+        st.subheader("📝 Transcription")
+        st.info(" ".join(i["transcript"] for i in items if i["transcript"]) or "…")
+    with col_r:
+        st.subheader(f"🌐 Translation ({target_lang})")
+        st.success(" ".join(i["translation"] for i in items if i["translation"]) or "…")
+    
+    end = items[-1]["end"] if items else 0
+    st.caption(f"⏱️ {job['status'].capitalize()} · processed up to {end:.0f}s · {job['done']} segments")
+    failed = sum(1 for i in items if i["error"])
+    if job["status"] == "done":
+        if not any(i["transcript"] for i in items):
+            st.warning("No speech could be recognized in this recording.")
+        if failed:
+            st.warning(f"{failed} segment(s) could not be processed. Submit the file again to retry them.")
+        stats = job["stats"] or {}
+        if stats.get("bytes"):
+            total = sum(stats["bytes"].values())
+            st.caption(f"📦 Bytes copied: {total / 1e6:.2f} MB ({', '.join(f'{k}: {v / 1e6:.2f} MB' for k, v in stats['bytes'].items())})")
+        vad = stats.get("vad")
+        if vad and vad["trimmed_seconds"]:
+            audio = vad["sent_seconds"] + vad["trimmed_seconds"]
+            st.caption(f"🔇 Silence trimmed before recognition: {vad['trimmed_seconds']:.1f}s of {audio:.1f}s "
+                       f"({vad['trimmed_seconds'] / audio:.0%}, {vad['trimmed_bytes'] / 1e6:.2f} MB of PCM not sent)")
+    elif job["status"] == "failed":
+        st.error(f"❌ Audio processing error: {job['error']}")
+    elif job["status"] == "interrupted":
+        st.info("⏸️ Interrupted. Submit the same file again to resume from the last finished segment.")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+@st.fragment(run_every=1.0)
+def watch_voice_job(job_id):
+    # Polls the job store while the job runs; one full rerun once it settles stops the polling
+    job = get_jobs(API_KEY).status(job_id)
+    show_voice_job(job)
+    if job["status"] not in ACTIVE:
+        st.rerun()
+
+
+def show_sentiment_job(job):
+    results = [{k: v for k, v in item.items() if k != "index"} for item in job["items"]]
+    st.markdown("<div class='card'>", unsafe_allow_html=True)
+    st.subheader("📊 Batch Results")
+    if job["status"] in ACTIVE:
+        total = job["total"] or 0
+        st.progress(job["done"] / total if total else 0.0, text=f"{job['done']}/{total or '?'} analyzed")
+    elif job["status"] == "failed":
+        st.error(f"❌ Error: {job['error']}")
+    elif job["status"] == "interrupted":
+        st.info("⏸️ Interrupted. Analyze the same file again to resume from the last finished row.")
+    if results:
+        counts = {label: sum(r["sentiment"] == label for r in results) for label in sentiment_api.LABELS + ("ERROR",)}
+        count_cols = st.columns(len(counts))
+        for count_col, (label, count) in zip(count_cols, counts.items()):
+            count_col.metric(label, count)
+        local_count = sum(r["source"] == "local" for r in results)
+        st.caption(f"⚡ {local_count} of {len(results)} answered by the local classifier, "
+                   f"{len(results) - local_count} sent to Gemini")
+        if job["status"] == "done" and counts["ERROR"]:
+            st.warning(f"{counts['ERROR']} row(s) could not be analyzed. Analyze the same file again to retry them.")
+        st.dataframe(results, use_container_width=True)
+        if job["status"] not in ACTIVE:
+            st.download_button(
+                label="📥 Download CSV",
+                data=sentiment_api.to_csv(results),
+                file_name="sentiment_results.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+@st.fragment(run_every=1.0)
+def watch_sentiment_job(job_id):
+    job = get_jobs(API_KEY).status(job_id)
+    show_sentiment_job(job)
+    if job["status"] not in ACTIVE:
+        st.rerun()
+
+
+def render_voice_job(job_id):
+    job = get_jobs(API_KEY).status(job_id)
+    if job is None:
+        st.warning("⚠️ Unknown job ID.")
+    elif job["status"] in ACTIVE:
+        watch_voice_job(job_id)
+    else:
+        show_voice_job(job)
+
 
 # ---------------------------
 # MAIN CONTENT AREA
@@ -253,31 +248,48 @@ if "Sentiment Analysis" in option:
         </div>
         """, unsafe_allow_html=True)
         
-        # Example sentiments
-        with st.expander("📋 Try these examples", expanded=True):
-            examples = {
-                "Positive": "I absolutely love this product! It has changed my life for the better.",
-                "Negative": "This is the worst service I've ever experienced. Never coming back.",
-                "Neutral": "The package arrived on Tuesday as scheduled."
-            }
-            
-            example_choice = st.selectbox("Load example:", ["Select..."] + list(examples.keys()))
-            if example_choice != "Select...":
-                user_text = examples[example_choice]
-            else:
-                user_text = ""
-        
-        user_input = st.text_area(
-            "Enter text to analyze:",
-            value=user_text,
-            height=150,
-            placeholder="Type or paste your text here...",
-            key="sentiment_input"
+        sentiment_mode = st.radio(
+            "Mode:",
+            ["📝 Single Text", "📂 Batch File"],
+            horizontal=True,
+            key="sentiment_mode"
         )
         
-        analyze_col1, analyze_col2 = st.columns([1, 3])
-        with analyze_col1:
-            analyze_btn = st.button("🚀 Analyze", type="primary", use_container_width=True)
+        if "Single" in sentiment_mode:
+            # Example sentiments
+            with st.expander("📋 Try these examples", expanded=True):
+                examples = {
+                    "Positive": "I absolutely love this product! It has changed my life for the better.",
+                    "Negative": "This is the worst service I've ever experienced. Never coming back.",
+                    "Neutral": "The package arrived on Tuesday as scheduled."
+                }
+                
+                example_choice = st.selectbox("Load example:", ["Select..."] + list(examples.keys()))
+                if example_choice != "Select...":
+                    user_text = examples[example_choice]
+                else:
+                    user_text = ""
+            
+            user_input = st.text_area(
+                "Enter text to analyze:",
+                value=user_text,
+                height=150,
+                placeholder="Type or paste your text here...",
+                key="sentiment_input"
+            )
+            render_token_count(user_input, "sentiment")
+            
+            analyze_col1, analyze_col2 = st.columns([1, 3])
+            with analyze_col1:
+                analyze_btn = st.button("🚀 Analyze", type="primary", use_container_width=True)
+        else:
+            batch_file = st.file_uploader(
+                "Upload a CSV or JSONL file",
+                type=["csv", "jsonl"],
+                key="sentiment_batch_file"
+            )
+            text_column = st.text_input("Text column / JSON field:", value="text", key="sentiment_batch_column")
+            batch_btn = st.button("🚀 Analyze Batch", type="primary", use_container_width=True)
     
     with col2:
         st.markdown("""
@@ -293,51 +305,66 @@ if "Sentiment Analysis" in option:
         </div>
         """, unsafe_allow_html=True)
     
-    if analyze_btn:
+    if "Single" in sentiment_mode and analyze_btn:
         if not user_input.strip():
             st.warning("⚠️ Please enter some text to analyze.")
         else:
             with st.spinner("🤔 Analyzing sentiment..."):
-                prompt = f"""
-                Analyze the sentiment of this text and classify it as:
-                - POSITIVE if it expresses happiness, satisfaction, or approval
-                - NEGATIVE if it expresses anger, disappointment, or disapproval  
-                - NEUTRAL if it's factual without strong emotion
-                
-                Text: "{user_input}"
-                
-                Respond with exactly one word: POSITIVE, NEGATIVE, or NEUTRAL
-                """
                 try:
-                    resp = client.models.generate_content(
-                        model="models/gemini-2.5-flash", 
-                        contents=prompt
-                    )
-                    sentiment = resp.text.strip().upper()
+                    result = service.sentiment(user_input)
+                    sentiment = result["sentiment"]
                     
                     # Display result with nice UI
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
                     st.subheader("📊 Analysis Result")
                     
                     # Color-coded result
-                    if "POSITIVE" in sentiment:
+                    if sentiment == "POSITIVE":
                         st.success(f"## 😊 {sentiment}")
-                        st.progress(0.9)
                         st.markdown("This text expresses positive emotions!")
-                    elif "NEGATIVE" in sentiment:
+                    elif sentiment == "NEGATIVE":
                         st.error(f"## 😠 {sentiment}")
-                        st.progress(0.2)
                         st.markdown("This text expresses negative emotions.")
                     else:
                         st.info(f"## 😐 {sentiment}")
-                        st.progress(0.5)
                         st.markdown("This text is neutral or factual.")
+                    st.progress(result["score"], text=f"Confidence: {result['score']:.0%}")
+                    
+                    if result["aspects"]:
+                        st.markdown("**Aspects:**")
+                        st.dataframe(result["aspects"], use_container_width=True)
                     
                     st.markdown(f"**Text analyzed:** _{user_input[:100]}..._")
                     st.markdown("</div>", unsafe_allow_html=True)
                     
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
+    
+    elif "Batch" in sentiment_mode and batch_btn:
+        if batch_file is None:
+            st.warning("⚠️ Please upload a CSV or JSONL file.")
+        else:
+            try:
+                texts = sentiment_api.load_texts(batch_file.getvalue(), batch_file.name, column=text_column)
+            except Exception as e:
+                texts = None
+                st.error(f"❌ Could not read file: {str(e)}")
+            
+            if texts == []:
+                st.warning("⚠️ No texts found in the uploaded file.")
+            elif texts:
+                # Runs as a background job: the page polls it, and re-analyzing the same file resumes it
+                try:
+                    st.session_state.sentiment_job_id = get_jobs(API_KEY).submit_sentiment_batch(texts)
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+    
+    if "Batch" in sentiment_mode and st.session_state.get("sentiment_job_id"):
+        job = get_jobs(API_KEY).status(st.session_state.sentiment_job_id)
+        if job is not None and job["status"] in ACTIVE:
+            watch_sentiment_job(job["id"])
+        elif job is not None:
+            show_sentiment_job(job)
 
 # ---------------------------
 # TEXT GENERATION
@@ -375,15 +402,27 @@ elif "Text Generation" in option:
             placeholder="What would you like to create?",
             key="gen_prompt"
         )
+        render_token_count(prompt_input, "generation")
         
         # Generation parameters
         col_a, col_b = st.columns(2)
         with col_a:
-            tone = st.selectbox("Tone:", ["Professional", "Creative", "Casual", "Formal", "Friendly"])
+            tone = st.selectbox("Tone:", TONES)
         with col_b:
-            length = st.selectbox("Length:", ["Short", "Medium", "Long"])
+            length = st.selectbox("Length:", LENGTHS)
+        
+        stream_output = st.checkbox("⚡ Stream output", value=True, key="gen_stream")
+        chat_mode = st.checkbox("💬 Chat mode (follow-up prompts refine earlier replies)", key="gen_chat")
+        if chat_mode:
+            chat_context = st.text_area(
+                "📎 Reference context (optional, cached for the whole conversation):",
+                height=80,
+                placeholder="Style guide, product facts, an earlier draft...",
+                key="chat_context"
+            )
+            render_token_count(chat_context, "chat_context")
         
-        generate_btn = st.button("✨ Generate", type="primary", use_container_width=True)
+        generate_btn = st.button("💬 Send" if chat_mode else "✨ Generate", type="primary", use_container_width=True)
     
     with col2:
         st.markdown("""
@@ -399,34 +438,85 @@ elif "Text Generation" in option:
         </div>
         """, unsafe_allow_html=True)
     
-    if generate_btn:
+    if chat_mode:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.subheader("💬 Conversation")
+        history = st.session_state.setdefault("chat_messages", [])
+        for message in history:
+            with st.chat_message(message["role"]):
+                st.markdown(message["text"])
+        
+        if generate_btn and not prompt_input.strip():
+            st.warning("⚠️ Please enter a prompt.")
+        elif generate_btn:
+            with st.chat_message("user"):
+                st.markdown(prompt_input)
+            try:
+                metrics = {}
+                session_id = st.session_state.get("chat_session_id")
+                with st.chat_message("assistant"):
+                    if stream_output:
+                        session_id, chunks = service.chat_stream(prompt_input, session_id, tone, length, chat_context,
+                                                                 metrics=metrics)
+                        placeholder = st.empty()
+                        reply = ""
+                        for chunk in chunks:
+                            reply += chunk
+                            placeholder.markdown(reply + "▌")
+                        placeholder.markdown(reply)
+                    else:
+                        result = service.chat(prompt_input, session_id, tone, length, chat_context, metrics=metrics)
+                        session_id, reply = result["session_id"], result["text"]
+                        st.markdown(reply)
+                st.session_state.chat_session_id = session_id
+                history += [{"role": "user", "text": prompt_input}, {"role": "assistant", "text": reply}]
+                st.session_state.setdefault("generation_metrics", []).append(metrics)
+                info = service.chats.get(session_id).info()
+                st.caption(f"⏱️ {metrics['total']:.2f}s · history: ~{info['history_tokens']:,} tokens"
+                           f" · compacted {info['compactions']}×")
+            except Exception as e:
+                st.error(f"❌ Error: {str(e)}")
+        
+        if history and st.button("🧹 New conversation", use_container_width=True):
+            service.chat_reset(st.session_state.pop("chat_session_id", None))
+            history.clear()
+            st.rerun()
+        st.markdown("</div>", unsafe_allow_html=True)
+    
+    elif generate_btn:
         if not prompt_input.strip():
             st.warning("⚠️ Please enter a prompt.")
         else:
             with st.spinner("✨ Creating magic..."):
-                enhanced_prompt = f"""
-                You are a helpful AI assistant. Generate text with the following requirements:
-                - Tone: {tone}
-                - Length: {length}
-                - Prompt: {prompt_input}
-                
-                Provide a well-structured, engaging response.
-                """
                 try:
-                    resp = client.models.generate_content(
-                        model="models/gemini-2.5-flash", 
-                        contents=enhanced_prompt
-                    )
-                    
                     # Display result
                     st.markdown("<div class='card'>", unsafe_allow_html=True)
                     st.subheader("📝 Generated Text")
-                    st.markdown(resp.text)
+                    
+                    metrics = {}
+                    if stream_output:
+                        placeholder = st.empty()
+                        generated = ""
+                        for chunk in service.generate_stream(prompt_input, tone, length, metrics=metrics):
+                            generated += chunk
+                            placeholder.markdown(generated + "▌")
+                        placeholder.markdown(generated)
+                    else:
+                        generated = service.generate(prompt_input, tone, length, metrics=metrics)["text"]
+                        st.markdown(generated)
+                    
+                    # Latency metrics for this request
+                    st.session_state.setdefault("generation_metrics", []).append(metrics)
+                    metric_col1, metric_col2 = st.columns(2)
+                    metric_col1.metric("Time to first token", f"{metrics['ttft']:.2f}s")
+                    metric_col2.metric("Total latency", f"{metrics['total']:.2f}s")
+                    with st.expander("📈 Latency history (this session)"):
+                        st.dataframe(st.session_state.generation_metrics, use_container_width=True)
                     
                     # Download button
                     st.download_button(
                         label="📥 Download Text",
-                        data=resp.text,
+                        data=generated,
                         file_name="generated_text.txt",
                         mime="text/plain",
                         use_container_width=True
@@ -453,7 +543,7 @@ else:
         # Translation mode
         mode = st.radio(
             "Translation Mode:",
-            ["📝 Text Translation", "🎤 Voice Translation"],
+            ["📝 Text Translation", "🌐 Multi-language", "📄 Document Translation", "🎤 Voice Translation"],
             horizontal=True
         )
         
@@ -462,7 +552,7 @@ else:
         with lang_col1:
             source_lang = st.selectbox(
                 "From:",
-                list(LANGUAGES.keys()),
+                LANGUAGE_NAMES,
                 index=0,
                 key="source_lang"
             )
@@ -470,8 +560,8 @@ else:
         with lang_col2:
             target_lang = st.selectbox(
                 "To:",
-                list(LANGUAGES.keys()),
-                index=list(LANGUAGES.keys()).index("Telugu") if "Telugu" in LANGUAGES else 1,
+                LANGUAGE_NAMES,
+                index=DEFAULT_TARGET_INDEX,
                 key="target_lang"
             )
         
@@ -479,15 +569,17 @@ else:
         if "Text" in mode:
             st.markdown("### 📝 Enter Text")
             
+            prefetcher = get_prefetcher(API_KEY)
+            # Queued once per source; the examples are translated and voiced only after the app has been idle
+            # for a while, from the source selected above so that Translate makes the same call
+            prefetcher.warm(EXAMPLE_TEXTS, POPULAR_TARGETS, source_lang)
             with st.expander("🌐 Example Texts", expanded=False):
-                examples = {
-                    "Hello, how are you?": "English",
-                    "नमस्ते, आप कैसे हैं?": "Hindi",
-                    "Hola, ¿cómo estás?": "Spanish"
-                }
-                for text, lang in examples.items():
+                for text, lang in EXAMPLE_TEXTS.items():
                     if st.button(f"Use: '{text[:20]}...' ({lang})", key=text):
                         st.session_state.translate_text = text
+                prefetch_stats = prefetcher.stats()
+                st.caption(f"⚡ Prefetched {prefetch_stats['warmed']} translations with audio · "
+                           f"{prefetch_stats['hit_rate']:.0%} used · {prefetch_stats['budget_left']} left in budget")
             
             text_to_translate = st.text_area(
                 "Text to translate:",
@@ -496,6 +588,7 @@ else:
                 placeholder="Type or paste text here...",
                 key="translate_input"
             )
+            render_token_count(text_to_translate, "translation")
             
             translate_btn = st.button("🌐 Translate", type="primary", use_container_width=True)
             
@@ -504,51 +597,57 @@ else:
                     st.warning("⚠️ Please enter text to translate.")
                 else:
                     with st.spinner("🔍 Translating..."):
-                        prompt = f"""
-                        Translate the following text from {source_lang} to {target_lang}:
-                        
-                        Text: "{text_to_translate}"
-                        
-                        Provide only the translation, no additional text.
-                        """
                         try:
-                            resp = client.models.generate_content(
-                                model="models/gemini-2.5-flash", 
-                                contents=prompt
-                            )
-                            translation = resp.text.strip()
+                            result = prefetcher.translate(text_to_translate, source_lang, target_lang)
+                            translation = result["translation"]
+                            match = result["memory"]
+                            # Speech starts now and is synthesized while the text card renders
+                            speech_future = prefetcher.speech(translation, target_lang)
                             
                             # Display results
                             st.markdown("<div class='card'>", unsafe_allow_html=True)
                             col_a, col_b = st.columns(2)
                             
                             with col_a:
-                                st.markdown(f"**Original ({source_lang}):**")
+                                st.markdown(f"**Original ({result['detected_lang'] or source_lang}):**")
+                                if result["detected_lang"]:
+                                    st.caption(f"🔎 Detected locally: {result['detected_lang']}")
                                 st.info(text_to_translate)
                             
                             with col_b:
                                 st.markdown(f"**Translation ({target_lang}):**")
                                 st.success(translation)
+                                if match and match["kind"] == "exact":
+                                    st.caption("🧠 From translation memory (exact match)")
+                                elif match and match["kind"] == "fuzzy":
+                                    st.caption(f"🧠 From translation memory ({match['similarity']:.0%} match: \"{match['source']}\")")
+                                elif match:
+                                    with st.expander(f"🧠 Similar earlier translation ({match['similarity']:.0%} match)"):
+                                        st.markdown(f"**{match['source']}**")
+                                        st.markdown(match["target"])
                             
                             # Audio output
                             st.markdown("### 🔊 Listen to Translation")
-                            tts_lang = LANGUAGES.get(target_lang, "en")
                             try:
-                                tts = gTTS(text=translation, lang=tts_lang)
-                                audio_file = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-                                tts.save(audio_file.name)
+                                # Served from the TTS cache when this phrase was synthesized (or prefetched) before;
+                                # the same bytes feed the player and the download
+                                wait_start = time.perf_counter()
+                                with st.spinner("🔊 Preparing audio..."):
+                                    audio_bytes = speech_future.result()
+                                audio_wait = time.perf_counter() - wait_start
                                 
-                                st.audio(audio_file.name, format="audio/mp3")
+                                st.audio(audio_bytes, format="audio/mp3")
                                 
-                                with open(audio_file.name, "rb") as f:
-                                    st.download_button(
-                                        "📥 Download Audio",
-                                        f,
-                                        file_name=f"translation_{target_lang}.mp3",
-                                        mime="audio/mp3",
-                                        use_container_width=True
-                                    )
-                            except Exception as e:
+                                st.download_button(
+                                    "📥 Download Audio",
+                                    audio_bytes,
+                                    file_name=f"translation_{target_lang}.mp3",
+                                    mime="audio/mp3",
+                                    use_container_width=True
+                                )
+                                st.caption(f"📦 Bytes copied: {len(audio_bytes) / 1e6:.2f} MB "
+                                           f"(tts, ready {audio_wait:.2f}s after the text)")
+                            except Exception:
                                 st.warning(f"Audio generation not available for {target_lang}")
                             
                             st.markdown("</div>", unsafe_allow_html=True)
@@ -556,6 +655,116 @@ else:
                         except Exception as e:
                             st.error(f"❌ Translation error: {str(e)}")
         
+        # One text into many languages
+        elif "Multi" in mode:
+            st.markdown("### 🌐 Translate into Several Languages")
+            
+            multi_text = st.text_area(
+                "Text to translate:",
+                height=100,
+                placeholder="A UI string, a template, a short message...",
+                key="multi_input"
+            )
+            multi_targets = st.multiselect(
+                "Target languages (the \"To\" box above is ignored here):",
+                LANGUAGE_NAMES[1:],
+                default=[target_lang] if target_lang != "Auto Detect" else [],
+                key="multi_targets"
+            )
+            
+            if st.button("🌐 Translate All", type="primary", use_container_width=True):
+                if not multi_text.strip() or not multi_targets:
+                    st.warning("⚠️ Please enter text and pick at least one language.")
+                else:
+                    progress = st.progress(0.0, text=f"Translating into {len(multi_targets)} languages...")
+                    try:
+                        st.session_state.multi_result = service.translate_multi(
+                            multi_text,
+                            source_lang,
+                            multi_targets,
+                            on_progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} languages")
+                        )
+                    except Exception as e:
+                        st.session_state.pop("multi_result", None)
+                        st.error(f"❌ Translation error: {str(e)}")
+            
+            # Results live in session state so listening to one language doesn't re-translate all of them
+            multi_result = st.session_state.get("multi_result")
+            if multi_result:
+                st.markdown("<div class='card'>", unsafe_allow_html=True)
+                if multi_result["detected_lang"]:
+                    st.caption(f"🔎 Detected locally: {multi_result['detected_lang']}")
+                st.dataframe(multi_result["translations"], use_container_width=True)
+                st.download_button(
+                    "📥 Download JSON",
+                    json.dumps(multi_result, ensure_ascii=False, indent=2),
+                    file_name="translations.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
+                
+                # Speech is synthesized only for the language the user asks to hear
+                by_lang = {row["target_lang"]: row["translation"] for row in multi_result["translations"]}
+                listen_col, play_col = st.columns([3, 1])
+                listen_lang = listen_col.selectbox("🔊 Listen to:", list(by_lang), key="multi_listen")
+                if play_col.button("▶️ Play", use_container_width=True):
+                    try:
+                        st.audio(service.speech(by_lang[listen_lang], listen_lang), format="audio/mp3")
+                    except Exception:
+                        st.warning(f"Audio generation not available for {listen_lang}")
+                st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Document translation
+        elif "Document" in mode:
+            st.markdown("### 📄 Translate a Document")
+            
+            doc_file = st.file_uploader(
+                "Upload a text or Markdown file",
+                type=["txt", "md"],
+                key="doc_upload"
+            )
+            doc_text = st.text_area(
+                "...or paste the document:",
+                value=doc_file.getvalue().decode("utf-8", errors="replace") if doc_file is not None else "",
+                height=200,
+                key="doc_input"
+            )
+            
+            if st.button("📄 Translate Document", type="primary", use_container_width=True):
+                if not doc_text.strip():
+                    st.warning("⚠️ Please upload or paste a document.")
+                else:
+                    progress = st.progress(0.0, text="Splitting document...")
+                    try:
+                        result = service.translate_document(
+                            doc_text,
+                            source_lang,
+                            target_lang,
+                            on_progress=lambda done, total: progress.progress(done / total, text=f"{done}/{total} segments")
+                        )
+                        
+                        st.markdown("<div class='card'>", unsafe_allow_html=True)
+                        st.subheader(f"🌐 Translation ({target_lang})")
+                        if result["detected_lang"]:
+                            st.caption(f"🔎 Detected locally: {result['detected_lang']}")
+                        seg_col1, seg_col2, seg_col3 = st.columns(3)
+                        seg_col1.metric("Segments", result["segments"])
+                        seg_col2.metric("Reused", result["reused"])
+                        seg_col3.metric("Sent", result["sent"])
+                        st.markdown(result["text"])
+                        
+                        st.download_button(
+                            "📥 Download Translation",
+                            result["text"],
+                            file_name=f"translation_{target_lang}.md",
+                            mime="text/markdown",
+                            use_container_width=True
+                        )
+                        st.markdown("</div>", unsafe_allow_html=True)
+                        
+                    except Exception as e:
+                        st.error(f"❌ Translation error: {str(e)}")
+        
         # Voice translation
         else:
             st.markdown("### 🎤 Upload Audio")
@@ -572,52 +781,22 @@ else:
                 st.audio(audio_file, format=f"audio/{audio_file.name.split('.')[-1]}")
                 
                 if st.button("🎤 Transcribe & Translate", type="primary", use_container_width=True):
-                    with st.spinner("Processing audio..."):
-                        # Save uploaded file
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio_file.name)[1]) as tmp:
-                            tmp.write(audio_file.read())
-                            audio_path = tmp.name
-                        
-                        try:
-                            # Convert to WAV if needed
-                            if not audio_path.endswith('.wav'):
-                                sound = AudioSegment.from_file(audio_path)
-                                wav_path = tempfile.NamedTemporaryFile(delete=False, suffix=".wav").name
-                                sound.export(wav_path, format="wav")
-                            else:
-                                wav_path = audio_path
-                            
-                            # Transcribe
-                            recognizer = sr.Recognizer()
-                            with sr.AudioFile(wav_path) as source:
-                                audio_data = recognizer.record(source)
-                            
-                            src_lang_code = LANGUAGES.get(source_lang)
-                            if src_lang_code:
-                                transcript = recognizer.recognize_google(audio_data, language=src_lang_code)
-                            else:
-                                transcript = recognizer.recognize_google(audio_data)
-                            
-                            st.markdown("<div class='card'>", unsafe_allow_html=True)
-                            st.subheader("📝 Transcription")
-                            st.info(transcript)
-                            
-                            # Translate transcription
-                            with st.spinner("Translating..."):
-                                prompt = f"Translate from {source_lang} to {target_lang}: {transcript}"
-                                resp = client.models.generate_content(
-                                    model="models/gemini-2.5-flash", 
-                                    contents=prompt
-                                )
-                                translation = resp.text.strip()
-                                
-                                st.subheader(f"🌐 Translation ({target_lang})")
-                                st.success(translation)
-                            
-                            st.markdown("</div>", unsafe_allow_html=True)
-                            
-                        except Exception as e:
-                            st.error(f"❌ Audio processing error: {str(e)}")
+                    # Runs as a background job: closing the tab or rerunning doesn't lose the work, and
+                    # submitting the same file again resumes from the last finished segment
+                    try:
+                        st.session_state.voice_job_id = get_jobs(API_KEY).submit_voice(
+                            audio_file.getbuffer(),
+                            audio_file.name,
+                            source_lang,
+                            target_lang
+                        )
+                    except Exception as e:
+                        st.error(f"❌ Audio processing error: {str(e)}")
+            
+            job_id = st.text_input("🧾 Job ID:", key="voice_job_id",
+                                   help="Paste the ID of an earlier job to see its progress and results")
+            if job_id.strip():
+                render_voice_job(job_id.strip())
     
     with col2:
         st.markdown("""
@@ -637,6 +816,26 @@ else:
             <p><small>More languages added regularly</small></p>
         </div>
         """, unsafe_allow_html=True)
+        
+        # Translation memory: reused before any model call, preloadable from TMX / JSONL
+        with st.expander("🧠 Translation Memory"):
+            memory = service.memory
+            tm_stats = memory.stats()
+            st.caption(
+                f"{tm_stats['units']} segments · {tm_stats['exact']} exact / {tm_stats['fuzzy']} fuzzy reuses · "
+                f"{tm_stats['reuse_rate']:.0%} reuse rate"
+            )
+            tm_file = st.file_uploader("Import TMX or JSONL", type=["tmx", "xml", "jsonl"], key="tm_upload")
+            if tm_file is not None and st.button("📥 Import", use_container_width=True):
+                try:
+                    load = memory.import_tmx if tm_file.name.lower().endswith((".tmx", ".xml")) else memory.import_jsonl
+                    st.success(f"Imported {load(tm_file.getvalue())} segments")
+                except ValueError as e:
+                    st.error(f"❌ Import failed: {str(e)}")
+            st.download_button("📤 Export TMX", memory.export_tmx(), file_name="translation_memory.tmx",
+                               mime="application/x-tmx+xml", use_container_width=True)
+            st.download_button("📤 Export JSONL", memory.export_jsonl(), file_name="translation_memory.jsonl",
+                               mime="application/x-ndjson", use_container_width=True)
 
 # ---------------------------
 # FOOTER
@@ -0,0 +1,322 @@
+# audio_pipeline.py
+import functools
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import speech_recognition as sr
+from pydub import AudioSegment
+
+import telemetry
+
+# Recognizer input format: 16 kHz mono 16-bit PCM is all recognize_google needs
+# (8 kHz is accepted but costs recognition accuracy for a negligible upload saving once silence is trimmed)
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+FRAME_MS = 30
+READ_SECONDS = 5            # PCM read from the decoder per block
+
+SILENCE_DBFS = -40.0
+MIN_SILENCE_MS = 500        # pause long enough to cut at
+MIN_SEGMENT_MS = 4000       # don't cut shorter than this
+MAX_SEGMENT_MS = 30000      # hard cut; the free web speech API rejects long clips
+PAD_MS = 150                # audio kept either side of speech; longer pauses inside a segment shrink to 2x this
+FRICATIVE_DB = 6.0          # quiet frames this close to the threshold count as speech if their ZCR is high
+FRICATIVE_ZCR = 0.25        # zero crossings per sample typical of s/f/th sounds, far above voiced speech
+
+MAX_WORKERS = 4
+
+# Uploads above this size, or in containers ffmpeg can't parse from a pipe, go through a temp file
+SPILL_BYTES = int(os.getenv("AUDIO_SPILL_BYTES", str(64 * 1024 * 1024)))
+SEEKABLE_FORMATS = {"m4a", "mp4", "mov", "3gp"}
+PIPE_CHUNK = 64 * 1024
+
+
+# ---------------------------
+# Byte accounting
+# ---------------------------
+class ByteMeter:
+    # Counts bytes copied per stage of a request (pipe writes, spills, PCM reads, segment buffers),
+    # plus the decoded PCM that voice activity detection kept out of recognition
+    def __init__(self):
+        self.stages = {}
+        self.trimmed = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, count):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0) + count
+
+    def trim(self, count):
+        with self._lock:
+            self.trimmed += count
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+    def vad_stats(self, sample_rate=SAMPLE_RATE):
+        rate = sample_rate * SAMPLE_WIDTH
+        sent = self.stages.get("segments", 0)
+        return {"sent_seconds": round(sent / rate, 2), "trimmed_seconds": round(self.trimmed / rate, 2),
+                "trimmed_bytes": self.trimmed}
+
+
+# ---------------------------
+# Input: in-memory by default, spilled to disk only when needed
+# ---------------------------
+@contextmanager
+def audio_source(data, suffix="", spill_bytes=SPILL_BYTES, meter=None):
+    # Yields either the buffer itself (piped to ffmpeg) or a temp file path that is always removed
+    view = memoryview(data)
+    if len(view) <= spill_bytes and suffix.lower().lstrip(".") not in SEEKABLE_FORMATS:
+        yield view
+        return
+
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(view)
+        if meter:
+            meter.add("spill", len(view))
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _feed(stdin, view, meter):
+    try:
+        for offset in range(0, len(view), PIPE_CHUNK):
+            piece = view[offset:offset + PIPE_CHUNK]
+            stdin.write(piece)
+            if meter:
+                meter.add("pipe", len(piece))
+    except (BrokenPipeError, OSError):
+        pass  # ffmpeg exited early; its exit status reports the problem
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+# ---------------------------
+# Decoding
+# ---------------------------
+def iter_pcm(source, sample_rate=SAMPLE_RATE, read_seconds=READ_SECONDS, meter=None):
+    # ffmpeg decodes, downmixes and resamples; we only ever hold one block of PCM.
+    # `source` is a buffer (streamed over stdin) or a file path.
+    piped = not isinstance(source, str)
+    cmd = [AudioSegment.converter, "-hide_banner", "-loglevel", "error"]
+    if not piped:
+        cmd.append("-nostdin")
+    cmd += [
+        "-i", "pipe:0" if piped else source,
+        "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1",
+    ]
+    block = sample_rate * SAMPLE_WIDTH * read_seconds
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if piped else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    # stderr is drained on its own thread so a chatty ffmpeg can never block on a full pipe
+    errors = []
+    threads = [threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)]
+    if piped:
+        threads.append(threading.Thread(target=_feed, args=(proc.stdin, source, meter), daemon=True))
+    for thread in threads:
+        thread.start()
+    decode_seconds = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            data = proc.stdout.read(block)
+            decode_seconds += time.perf_counter() - start
+            if not data:
+                break
+            if meter:
+                meter.add("pcm", len(data))
+            yield data
+        code = proc.wait()
+        for thread in threads:
+            thread.join()
+        if code != 0:
+            message = b"".join(errors).decode(errors="replace").strip()
+            raise RuntimeError(f"Audio decoding failed: {message}")
+    finally:
+        telemetry.record_stage("audio_decode", decode_seconds)
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+
+
+# ---------------------------
+# Voice activity detection and silence-based segmentation
+# ---------------------------
+def frame_features(pcm, frame_bytes):
+    # (dBFS, zero-crossing rate) of every whole frame of 16-bit mono PCM, computed in one pass
+    frames = np.frombuffer(pcm, dtype="<i2", count=len(pcm) // frame_bytes * frame_bytes // SAMPLE_WIDTH)
+    frames = frames.reshape(-1, frame_bytes // SAMPLE_WIDTH).astype(np.float32)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    dbfs = np.where(rms > 0, 20 * np.log10(np.maximum(rms, 1.0) / 32768), -120.0)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return dbfs, zcr
+
+
+def voiced_frames(dbfs, zcr, silence_dbfs=SILENCE_DBFS):
+    # Loud frames are speech; slightly quieter ones with a high zero-crossing rate are unvoiced consonants,
+    # which an energy-only gate would clip from the start and end of words
+    return (dbfs >= silence_dbfs) | ((dbfs >= silence_dbfs - FRICATIVE_DB) & (zcr >= FRICATIVE_ZCR))
+
+
+def trim_silence(pcm, voiced, pad_frames, frame_bytes):
+    # (speech PCM, first kept frame, last kept frame): frames more than pad_frames from any voiced frame are dropped,
+    # which trims both ends and shortens long inner pauses. None when nothing is voiced.
+    if not voiced.any():
+        return None
+    n = len(voiced)
+    index = np.arange(n)
+    seen = np.concatenate(([0], np.cumsum(voiced)))
+    keep = seen[np.minimum(index + pad_frames + 1, n)] > seen[np.maximum(index - pad_frames, 0)]
+    frames = np.frombuffer(pcm, dtype=np.uint8, count=n * frame_bytes).reshape(n, frame_bytes)
+    kept = np.flatnonzero(keep)
+    return frames[keep].tobytes(), int(kept[0]), int(kept[-1])
+
+
+def split_on_silence(blocks, sample_rate=SAMPLE_RATE, silence_dbfs=SILENCE_DBFS, min_silence_ms=MIN_SILENCE_MS,
+                     min_segment_ms=MIN_SEGMENT_MS, max_segment_ms=MAX_SEGMENT_MS, pad_ms=PAD_MS, meter=None):
+    # Yields (pcm_bytes, start_seconds, end_seconds) holding only speech: each decoded block is classified
+    # frame by frame in bulk, segments are cut at pauses, and every segment is trimmed to its speech plus
+    # pad_ms before it goes to recognition. All-silent segments are dropped.
+    frame_bytes = sample_rate * SAMPLE_WIDTH * FRAME_MS // 1000
+    pad_frames = pad_ms // FRAME_MS
+    parts, flags = [], []       # the current segment's PCM slices and voiced flags
+    silent_run = 0
+    start_frame = 0
+    pos = 0
+    leftover = b""
+    vad_seconds = 0.0
+
+    def emit():
+        pcm, voiced = b"".join(parts), np.concatenate(flags)
+        trimmed = trim_silence(pcm, voiced, pad_frames, frame_bytes)
+        speech, first, last = trimmed if trimmed else (b"", 0, -1)
+        _record_vad(len(speech), len(pcm) - len(speech), sample_rate, meter)
+        if speech:
+            return speech, (start_frame + first) * FRAME_MS / 1000, (start_frame + last + 1) * FRAME_MS / 1000
+        return None
+
+    try:
+        for block in blocks:
+            started = time.perf_counter()
+            data = leftover + block if leftover else block
+            usable = len(data) - len(data) % frame_bytes
+            leftover = data[usable:]
+            voiced = voiced_frames(*frame_features(data[:usable], frame_bytes), silence_dbfs)
+            cut = 0
+            for i, flag in enumerate(voiced.tolist()):
+                pos += 1
+                silent_run = 0 if flag else silent_run + FRAME_MS
+                length = (pos - start_frame) * FRAME_MS
+                if (silent_run >= min_silence_ms and length >= min_segment_ms) or length >= max_segment_ms:
+                    parts.append(data[cut * frame_bytes:(i + 1) * frame_bytes])
+                    flags.append(voiced[cut:i + 1])
+                    segment = emit()
+                    parts, flags = [], []
+                    cut, start_frame, silent_run = i + 1, pos, 0
+                    if segment:
+                        vad_seconds += time.perf_counter() - started
+                        yield segment
+                        started = time.perf_counter()
+            if cut < len(voiced):
+                parts.append(data[cut * frame_bytes:usable])
+                flags.append(voiced[cut:])
+            vad_seconds += time.perf_counter() - started
+
+        # A trailing partial frame (< FRAME_MS) is dropped with the rest of the silence
+        if parts:
+            segment = emit()
+            if segment:
+                yield segment
+    finally:
+        telemetry.record_stage("vad", vad_seconds)
+
+
+def _record_vad(sent, trimmed, sample_rate, meter):
+    rate = sample_rate * SAMPLE_WIDTH
+    if meter:
+        meter.add("segments", sent)
+        meter.trim(trimmed)
+    telemetry.registry.inc("genai_vad_audio_seconds_total", sent / rate, kind="sent")
+    telemetry.registry.inc("genai_vad_audio_seconds_total", trimmed / rate, kind="trimmed")
+
+
+# ---------------------------
+# Recognition
+# ---------------------------
+@functools.lru_cache(maxsize=None)
+def google_recognizer(language=None):
+    # One Recognizer per language for the life of the process; recognize_google keeps no per-call state on it
+    recognizer = sr.Recognizer()
+
+    def recognize(audio):
+        try:
+            if language:
+                return recognizer.recognize_google(audio, language=language)
+            return recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+
+    return recognize
+
+
+def _process_segment(index, pcm, start, end, recognize, translate, sample_rate):
+    result = {"index": index, "start": start, "end": end, "transcript": "", "translation": "", "error": None}
+    try:
+        with telemetry.stage("asr"):
+            result["transcript"] = recognize(sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH)).strip()
+        # Each worker translates its own segment as soon as it is transcribed
+        if translate and result["transcript"]:
+            result["translation"] = translate(result["transcript"]).strip()
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def transcribe_blocks(blocks, recognize, translate=None, max_workers=MAX_WORKERS, sample_rate=SAMPLE_RATE,
+                      meter=None, skip=()):
+    # Yields per-segment results in order while later segments are still decoding or in flight.
+    # At most 2 * max_workers segments are buffered, which bounds memory for long recordings.
+    # Segmentation is deterministic, so `skip` (segment indices finished on an earlier run) lets a job resume.
+    pending = deque()
+    process = telemetry.propagate(_process_segment)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        segments = split_on_silence(blocks, sample_rate, meter=meter)
+        for index, (pcm, start, end) in enumerate(segments):
+            if index in skip:
+                continue
+            pending.append(pool.submit(process, index, pcm, start, end, recognize, translate, sample_rate))
+            while pending and (len(pending) >= 2 * max_workers or pending[0].done()):
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def transcribe_stream(source, recognize, translate=None, max_workers=MAX_WORKERS, sample_rate=SAMPLE_RATE, meter=None,
+                      skip=()):
+    blocks = iter_pcm(source, sample_rate, meter=meter)
+    return transcribe_blocks(blocks, recognize, translate, max_workers=max_workers, sample_rate=sample_rate, meter=meter,
+                             skip=skip)
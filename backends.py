@@ -0,0 +1,66 @@
+# backends.py
+import os
+
+BACKEND = os.getenv("GENAI_BACKEND", "gemini")       # "gemini" or "fake"
+
+# Keep-alive pool shared by every session in the process
+MAX_CONNECTIONS = int(os.getenv("GENAI_MAX_CONNECTIONS", "32"))
+MAX_KEEPALIVE = int(os.getenv("GENAI_MAX_KEEPALIVE", "16"))
+# Points the real client at another endpoint, e.g. `python fake_backend.py`
+BASE_URL = os.getenv("GENAI_BASE_URL")
+
+
+def default_http_options():
+    import httpx
+    from google.genai import types
+
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE)
+    try:
+        return types.HttpOptions(base_url=BASE_URL, client_args={"limits": limits}, async_client_args={"limits": limits})
+    except ValueError:
+        # Older google-genai without client_args still pools connections with httpx defaults
+        return types.HttpOptions(base_url=BASE_URL) if BASE_URL else None
+
+
+# ---------------------------
+# A backend bundles the text model client and the speech recognizer
+# ---------------------------
+class GeminiBackend:
+    name = "gemini"
+    needs_api_key = True
+
+    def __init__(self, api_key=None, http_options=None):
+        from google import genai
+
+        self.client = genai.Client(api_key=api_key, http_options=http_options or default_http_options())
+
+    def recognizer(self, language=None):
+        from audio_pipeline import google_recognizer
+
+        return google_recognizer(language)
+
+
+class FakeBackend:
+    name = "fake"
+    needs_api_key = False
+
+    def __init__(self, asr_latency=0.3, **options):
+        from fake_backend import FakeClient
+
+        self.client = FakeClient(**options)
+        self.asr_latency = asr_latency
+
+    def recognizer(self, language=None):
+        from fake_backend import fake_recognizer
+
+        return fake_recognizer(language, latency=self.asr_latency)
+
+
+BACKENDS = {"gemini": GeminiBackend, "fake": FakeBackend}
+
+
+def create_backend(name=None, **options):
+    name = name or BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,191 @@
+# benchmark.py
+# End-to-end latency benchmark for the four app flows, offline by default.
+#   python benchmark.py --requests 100 --concurrency 16
+#   python benchmark.py --backend gemini --flows sentiment,translation --requests 20
+import argparse
+import array
+import json
+import math
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_pipeline import SAMPLE_RATE, transcribe_blocks
+from backends import create_backend
+from dispatcher import Dispatcher, set_dispatcher
+from generation import generation_prompt
+from llm import stream_text
+from percentiles import percentile
+from response_cache import ResponseCache, set_default_cache
+from sentiment import analyze_sentiment
+from translation import translate_text
+from tts import AudioCache, EchoEngine, TTSService, set_tts
+
+FLOWS = ["sentiment", "generation", "translation", "voice"]
+
+SENTIMENT_TEXTS = [
+    "I absolutely love this product! It has changed my life for the better.",
+    "This is the worst service I've ever experienced. Never coming back.",
+    "The package arrived on Tuesday as scheduled.",
+]
+GENERATION_PROMPTS = [
+    ("Write a short story about a robot who discovers art", "Creative", "Short"),
+    ("Write a professional email requesting a meeting", "Professional", "Medium"),
+    ("Explain how a neural network works in simple terms", "Friendly", "Long"),
+]
+TRANSLATION_TEXTS = ["Hello, how are you?", "नमस्ते, आप कैसे हैं?", "Hola, ¿cómo estás?"]
+
+
+# ---------------------------
+# Synthetic speech: tone bursts separated by pauses, already decoded to 16 kHz PCM
+# ---------------------------
+def synthetic_speech(seconds=12, burst=2.5, pause=0.8, block_seconds=5):
+    samples = array.array("h")
+    t = 0.0
+    while t < seconds:
+        n = int(SAMPLE_RATE * burst)
+        samples.extend(int(6000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(n))
+        samples.extend([0] * int(SAMPLE_RATE * pause))
+        t += burst + pause
+    pcm = samples.tobytes()
+    block = SAMPLE_RATE * 2 * block_seconds
+    return [pcm[i:i + block] for i in range(0, len(pcm), block)]
+
+
+# ---------------------------
+# Flows
+# ---------------------------
+def make_flows(backend, unique, speech_blocks):
+    client = backend.client
+
+    def tag(text, i):
+        # Distinct inputs keep the response cache out of the measurement unless --cache is given
+        return f"{text} (#{i})" if unique else text
+
+    def sentiment(i):
+        analyze_sentiment(client, tag(SENTIMENT_TEXTS[i % len(SENTIMENT_TEXTS)], i))
+        return {}
+
+    def generation(i):
+        prompt, tone, length = GENERATION_PROMPTS[i % len(GENERATION_PROMPTS)]
+        metrics = {}
+        for _ in stream_text(client, generation_prompt(tag(prompt, i), tone, length), metrics=metrics):
+            pass
+        return {"ttft": metrics["ttft"]}
+
+    def translation(i):
+        from tts import synthesize
+
+        text = translate_text(client, tag(TRANSLATION_TEXTS[i % len(TRANSLATION_TEXTS)], i), "Auto Detect", "Telugu")
+        synthesize(text, "te")
+        return {}
+
+    def voice(i):
+        recognize = backend.recognizer("en")
+        for segment in transcribe_blocks(
+            speech_blocks,
+            recognize,
+            translate=lambda text: translate_text(client, tag(text, i), "English", "Hindi"),
+        ):
+            if segment["error"]:
+                raise RuntimeError(segment["error"])
+        return {}
+
+    return {"sentiment": sentiment, "generation": generation, "translation": translation, "voice": voice}
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def run_flow(fn, requests, concurrency):
+    latencies, extras, errors = [], [], []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            extra = fn(i)
+        except Exception as e:
+            errors.append(repr(e))
+            return
+        latencies.append(time.perf_counter() - start)
+        extras.append(extra)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+
+    result = {
+        "requests": requests,
+        "errors": len(errors),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.fmean(latencies) if latencies else float("nan"),
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "wall": wall,
+    }
+    ttfts = [e["ttft"] for e in extras if "ttft" in e]
+    if ttfts:
+        result["ttft_p50"] = percentile(ttfts, 50)
+        result["ttft_p95"] = percentile(ttfts, 95)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app flows end to end")
+    parser.add_argument("--backend", default="fake", choices=["fake", "gemini"])
+    parser.add_argument("--flows", default=",".join(FLOWS), help="comma-separated subset of " + ",".join(FLOWS))
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake backend base latency (s)")
+    parser.add_argument("--per-token-latency", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake backend 429 probability")
+    parser.add_argument("--asr-latency", type=float, default=0.3)
+    parser.add_argument("--tts-latency", type=float, default=0.1)
+    parser.add_argument("--max-concurrency", type=int, default=32, help="dispatcher concurrency limit")
+    parser.add_argument("--rpm", type=float, default=100000, help="dispatcher rate limit")
+    parser.add_argument("--cache", action="store_true", help="allow response cache hits")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.backend == "fake":
+        backend = create_backend("fake", latency=args.latency, per_token_latency=args.per_token_latency,
+                                 error_rate=args.error_rate, asr_latency=args.asr_latency, seed=0)
+        tts_engine = EchoEngine(latency=args.tts_latency)
+    else:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        backend = create_backend("gemini", api_key=os.getenv("GEMINI_API_KEY"))
+        tts_engine = None
+
+    set_dispatcher(Dispatcher(max_concurrency=args.max_concurrency, requests_per_minute=args.rpm,
+                              burst=args.max_concurrency))
+    set_default_cache(ResponseCache(":memory:"))
+    set_tts(TTSService(engine=tts_engine, cache=AudioCache(directory=None)))
+
+    flows = make_flows(backend, unique=not args.cache, speech_blocks=synthetic_speech())
+    selected = [f.strip() for f in args.flows.split(",") if f.strip()]
+    results = {}
+    print(f"backend={args.backend} requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'flow':<12}{'ok':>5}{'err':>5}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'req/s':>9}{'ttft p50':>10}")
+    for name in selected:
+        result = run_flow(flows[name], args.requests, args.concurrency)
+        results[name] = result
+        ttft = f"{result['ttft_p50']:.3f}" if "ttft_p50" in result else "-"
+        print(f"{name:<12}{result['requests'] - result['errors']:>5}{result['errors']:>5}"
+              f"{result['p50']:>9.3f}{result['p95']:>9.3f}{result['p99']:>9.3f}{result['throughput']:>9.2f}{ttft:>10}")
+        if "first_error" in result:
+            print(f"  first error: {result['first_error']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# chat.py
+# Multi-turn chat for Text Generation. Each session keeps its turns in memory; the stable preamble
+# (tone, length and any reference context) goes into a server-side context cache when it is large
+# enough to qualify, and older turns are folded into a running summary once the history outgrows its budget.
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from dispatcher import get_dispatcher
+from generation import LENGTH_WORDS
+from prompt_budget import estimate_tokens
+from singleflight import get_singleflight
+
+HISTORY_TOKENS = int(os.getenv("GENAI_CHAT_HISTORY_TOKENS", "2000"))    # history sent verbatim per turn
+KEEP_TURNS = 2              # most recent exchanges never folded into the summary
+SUMMARY_WORDS = 150
+MAX_SESSIONS = int(os.getenv("GENAI_CHAT_SESSIONS", "256"))
+SESSION_TTL = int(os.getenv("GENAI_CHAT_SESSION_TTL", str(6 * 3600)))
+CONTEXT_CACHE_TTL = int(os.getenv("GENAI_CHAT_CACHE_TTL", "3600"))
+# Explicit caches below the model's minimum are rejected by the API; implicit prefix caching still applies
+MIN_CACHE_TOKENS = int(os.getenv("GENAI_CHAT_MIN_CACHE_TOKENS", "1024"))
+CACHE_REFRESH_MARGIN = 60   # seconds before expiry when a cache is recreated instead of reused
+
+
+def chat_preamble(tone, length, context=""):
+    preamble = (
+        f"You are a helpful writing assistant in a multi-turn conversation. Tone: {tone}. "
+        f"Keep each reply to {LENGTH_WORDS[length]} unless asked otherwise. "
+        "Later messages usually refine your earlier answers; revise them rather than starting over."
+    )
+    if context:
+        preamble += f"\n\nReference material for the whole conversation:\n{context}"
+    return preamble
+
+
+def summary_prompt(summary, turns):
+    transcript = "\n".join(f"{role.upper()}: {text}" for role, text in turns)
+    earlier = f"Summary so far:\n{summary}\n\n" if summary else ""
+    return (
+        f"Condense this conversation into at most {SUMMARY_WORDS} words. Keep facts, decisions, names and the "
+        f"user's stated preferences; drop pleasantries.\n\n{earlier}Conversation:\n{transcript}"
+    )
+
+
+def _content(role, text):
+    return {"role": role, "parts": [{"text": text}]}
+
+
+# ---------------------------
+# Sessions
+# ---------------------------
+class ChatSession:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.tone = "Professional"
+        self.length = "Medium"
+        self.context = ""
+        self.turns = []             # [(role, text)], role is "user" or "model"
+        self.summary = ""
+        self.compactions = 0
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def preamble(self):
+        return chat_preamble(self.tone, self.length, self.context)
+
+    def contents(self, message):
+        # Summary of folded turns first, then the recent turns verbatim, then the new message
+        contents = []
+        if self.summary:
+            contents += [_content("user", f"Summary of our conversation so far:\n{self.summary}"),
+                         _content("model", "Understood.")]
+        contents += [_content(role, text) for role, text in self.turns]
+        return contents + [_content("user", message)]
+
+    def history_tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(text) for _, text in self.turns)
+
+    def add_exchange(self, message, reply):
+        self.turns += [("user", message), ("model", reply)]
+        self.updated = time.time()
+
+    def compact(self, summarize, budget=HISTORY_TOKENS):
+        # Folds all but the last KEEP_TURNS exchanges into the summary once the history is over budget.
+        # `summarize(prompt)` returns the new summary; if it fails the old turns are simply dropped.
+        if self.history_tokens() <= budget or len(self.turns) <= 2 * KEEP_TURNS:
+            return False
+        older, self.turns = self.turns[:-2 * KEEP_TURNS], self.turns[-2 * KEEP_TURNS:]
+        try:
+            self.summary = summarize(summary_prompt(self.summary, older)).strip() or self.summary
+        except Exception:
+            pass
+        self.compactions += 1
+        return True
+
+    def info(self):
+        return {"session_id": self.id, "turns": len(self.turns) // 2, "compactions": self.compactions,
+                "history_tokens": self.history_tokens()}
+
+
+class ChatSessions:
+    # In-memory LRU of sessions; idle sessions expire after SESSION_TTL
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id=None):
+        # Unknown or expired IDs start a fresh session under that ID; None gets a new ID
+        session_id = session_id or uuid.uuid4().hex
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or time.time() - session.updated > self.ttl:
+                session = self._sessions[session_id] = ChatSession(session_id)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def reset(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+# ---------------------------
+# Server-side context caches
+# ---------------------------
+class ContextCaches:
+    # One client.caches entry per (model, preamble); sessions with the same tone and context share it
+    def __init__(self, client, ttl=CONTEXT_CACHE_TTL, min_tokens=MIN_CACHE_TOKENS):
+        self.client = client
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self._entries = OrderedDict()   # key -> (cache name or None, expires), oldest expiry first
+        self._lock = threading.Lock()
+        self.counters = {"created": 0, "reused": 0, "inline": 0, "expired": 0}
+
+    def get(self, model, preamble):
+        # Cache name to pass as cached_content, or None to send the preamble inline as system_instruction
+        if estimate_tokens(preamble) < self.min_tokens or not hasattr(self.client, "caches"):
+            self._count("inline")
+            return None
+        key = hashlib.sha256(f"{model}\n{preamble}".encode("utf-8")).hexdigest()
+        with self._lock:
+            self._evict()
+            name, expires = self._entries.get(key, (None, 0.0))
+            if expires - time.time() > CACHE_REFRESH_MARGIN:
+                self.counters["reused" if name else "inline"] += 1
+                return name
+        # The create is a network call: it goes through the dispatcher outside the lock, and concurrent
+        # sessions needing the same preamble wait for one create instead of each making their own
+        name, _ = get_singleflight().do(f"context-cache:{key}", lambda: self._create(key, model, preamble))
+        return name
+
+    def _create(self, key, model, preamble):
+        try:
+            cache = get_dispatcher().run(lambda: self.client.aio.caches.create(model=model, config={
+                "system_instruction": preamble, "ttl": f"{self.ttl}s", "display_name": f"chat-{key[:12]}",
+            }))
+            name, kind = cache.name, "created"
+        except Exception:
+            # Unsupported model or below its minimum size: stay inline until the entry expires
+            name, kind = None, "inline"
+        with self._lock:
+            self.counters[kind] += 1
+            self._entries.pop(key, None)
+            self._entries[key] = (name, time.time() + self.ttl)
+        return name
+
+    def _evict(self):
+        # Entries all live for self.ttl, so expired ones are at the front
+        now = time.time()
+        while self._entries:
+            key, (_, expires) = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            del self._entries[key]
+            self.counters["expired"] += 1
+
+    def _count(self, kind):
+        with self._lock:
+            self.counters[kind] += 1
+
+    def stats(self):
+        with self._lock:
+            self._evict()
+            return dict(self.counters, active=sum(1 for name, _ in self._entries.values() if name))
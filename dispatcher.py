@@ -0,0 +1,234 @@
+# dispatcher.py
+import asyncio
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+import httpx
+
+MAX_CONCURRENCY = int(os.getenv("GENAI_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.getenv("GENAI_RPM", "60"))
+BURST = int(os.getenv("GENAI_BURST", "10"))
+MAX_RETRIES = int(os.getenv("GENAI_MAX_RETRIES", "4"))
+BASE_DELAY = float(os.getenv("GENAI_BACKOFF_BASE", "0.5"))      # seconds
+MAX_DELAY = float(os.getenv("GENAI_BACKOFF_MAX", "20"))
+DEFAULT_DEADLINE = float(os.getenv("GENAI_DEADLINE", "60"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class StreamInterrupted(RuntimeError):
+    # Raised when a stream fails after chunks were already handed out; never retried
+    pass
+
+
+# ---------------------------
+# Error classification
+# ---------------------------
+def status_code(exc):
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(exc):
+    if isinstance(exc, (httpx.TransportError, ConnectionError)):
+        return True
+    return status_code(exc) in RETRYABLE_STATUS
+
+
+def retry_after(exc):
+    # Honour server hints: a Retry-After header or a RetryInfo "retryDelay": "12s" detail
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(getattr(exc, "details", "") or exc))
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt, hint=None, base=BASE_DELAY, cap=MAX_DELAY):
+    # Full jitter exponential backoff, never shorter than the server's hint
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    return max(delay, hint) if hint else delay
+
+
+# ---------------------------
+# Rate limiting
+# ---------------------------
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate                # tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, deadline_at=None):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                if deadline_at is not None and now + wait > deadline_at:
+                    raise DeadlineExceeded("rate limit wait exceeds deadline")
+                await asyncio.sleep(wait)
+
+
+# ---------------------------
+# Dispatcher: one event loop thread shared by every session in the process
+# ---------------------------
+class Dispatcher:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, requests_per_minute=REQUESTS_PER_MINUTE,
+                 burst=BURST, max_retries=MAX_RETRIES, default_deadline=DEFAULT_DEADLINE):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.default_deadline = default_deadline
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0, "in_flight": 0}
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="genai-dispatcher", daemon=True).start()
+            return self._loop
+
+    async def call(self, fn, deadline=None, timed=True):
+        # fn is a zero-argument coroutine function, re-invoked on every retry. With timed=False fn enforces
+        # the deadline itself; queueing and retries still stop at it.
+        deadline = self.default_deadline if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline if deadline else None
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                await self.bucket.acquire(deadline_at)
+                async with self.semaphore:
+                    self.counters["in_flight"] += 1
+                    try:
+                        if not timed:
+                            return await fn()
+                        timeout = deadline_at - time.monotonic() if deadline_at else None
+                        return await asyncio.wait_for(fn(), timeout=timeout)
+                    finally:
+                        self.counters["in_flight"] -= 1
+            except DeadlineExceeded:
+                self.counters["deadline_exceeded"] += 1
+                raise
+            except asyncio.TimeoutError:
+                self.counters["deadline_exceeded"] += 1
+                raise DeadlineExceeded(f"call exceeded {deadline:g}s deadline") from None
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                delay = backoff_delay(attempt, retry_after(e))
+                if deadline_at is not None and time.monotonic() + delay > deadline_at:
+                    self.counters["failures"] += 1
+                    raise
+            attempt += 1
+            self.counters["retries"] += 1
+            await asyncio.sleep(delay)
+
+    def run(self, fn, deadline=None):
+        return asyncio.run_coroutine_threadsafe(self.call(fn, deadline), self.loop()).result()
+
+    def generate(self, client, model, contents, config=None, deadline=None):
+        return self.run(
+            lambda: client.aio.models.generate_content(model=model, contents=contents, config=config),
+            deadline,
+        )
+
+    def stream(self, client, model, contents, config=None, deadline=None):
+        # Sync generator over an async stream; retries only happen before the first chunk.
+        # The deadline covers the wait for the first chunk, then applies again to each gap between chunks,
+        # so a long reply that keeps arriving is never cut off.
+        deadline = self.default_deadline if deadline is None else deadline
+        deadline_at = time.monotonic() + deadline if deadline else None
+        chunks = queue.Queue()
+
+        async def consume():
+            emitted = False
+            try:
+                stream = await asyncio.wait_for(
+                    client.aio.models.generate_content_stream(model=model, contents=contents, config=config),
+                    timeout=deadline_at - time.monotonic() if deadline_at else None,
+                )
+                while True:
+                    if emitted:
+                        timeout = deadline or None
+                    else:
+                        timeout = deadline_at - time.monotonic() if deadline_at else None
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        return
+                    emitted = True
+                    chunks.put(("chunk", chunk))
+            except asyncio.TimeoutError:
+                if emitted:
+                    self.counters["deadline_exceeded"] += 1
+                    raise StreamInterrupted(f"no chunk for {deadline:g}s") from None
+                raise
+            except Exception as e:
+                if emitted:
+                    raise StreamInterrupted(str(e)) from e
+                raise
+
+        async def produce():
+            try:
+                await self.call(consume, deadline, timed=False)
+                chunks.put(("done", None))
+            except BaseException as e:
+                chunks.put(("error", e))
+
+        future = asyncio.run_coroutine_threadsafe(produce(), self.loop())
+        try:
+            while True:
+                kind, value = chunks.get()
+                if kind == "chunk":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    def stats(self):
+        return dict(self.counters, max_concurrency=self.max_concurrency, tokens=round(self.bucket.tokens, 2))
+
+
+_default_dispatcher = None
+_default_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _default_dispatcher
+    with _default_lock:
+        if _default_dispatcher is None:
+            _default_dispatcher = Dispatcher()
+        return _default_dispatcher
+
+
+def set_dispatcher(dispatcher):
+    global _default_dispatcher
+    with _default_lock:
+        _default_dispatcher = dispatcher
@@ -0,0 +1,382 @@
+# fake_backend.py
+# Offline stand-in for the Gemini API and the speech recognizer.
+#   In-process:  FakeClient(latency=0.2, error_rate=0.05)
+#   Over HTTP:   python fake_backend.py --port 8765   then   GENAI_BASE_URL=http://127.0.0.1:8765
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+POSITIVE_WORDS = {"love", "great", "excellent", "good", "happy", "amazing", "best", "wonderful", "thanks", "perfect"}
+NEGATIVE_WORDS = {"worst", "bad", "terrible", "hate", "never", "awful", "disappointed", "broken", "angry", "refund"}
+LENGTH_WORDS = {"Short": 60, "Medium": 180, "Long": 450}
+LOREM = ("the quick model drafts a clear answer with useful detail and a friendly tone for every reader "
+         "while keeping each sentence short and easy to follow").split()
+
+FAKE_MODELS = [
+    {"name": "models/gemini-2.5-flash-lite", "input_token_limit": 1048576, "output_token_limit": 65536},
+    {"name": "models/gemini-2.5-flash", "input_token_limit": 1048576, "output_token_limit": 65536},
+    {"name": "models/gemini-2.5-pro", "input_token_limit": 1048576, "output_token_limit": 65536},
+]
+
+
+class FakeAPIError(Exception):
+    # Same attributes the dispatcher reads from google.genai.errors.APIError
+    def __init__(self, code, message, status="RESOURCE_EXHAUSTED", retry_delay=0.1):
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.message = message
+        self.details = {"error": {"code": code, "message": message, "status": status, "details": [
+            {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{retry_delay}s"}
+        ]}}
+
+
+# ---------------------------
+# Canned model behaviour
+# ---------------------------
+def count_tokens(text):
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _label(text):
+    words = set(re.findall(r"[a-z]+", text.lower()))
+    pos, neg = len(words & POSITIVE_WORDS), len(words & NEGATIVE_WORDS)
+    return "POSITIVE" if pos > neg else "NEGATIVE" if neg > pos else "NEUTRAL"
+
+
+def _sentiment(text):
+    label = _label(text)
+    return {"label": label, "score": 0.6 if label == "NEUTRAL" else 0.9, "aspects": []}
+
+
+def respond(prompt):
+    numbered = re.findall(r"^(\d+)\. (.*)$", prompt, re.MULTILINE)
+    if numbered and "sentiment" in prompt.lower():
+        return json.dumps([{"index": int(n), **_sentiment(text)} for n, text in numbered])
+    if "Analyze the sentiment" in prompt:
+        return json.dumps(_sentiment(prompt.split("Text:", 1)[-1].split("\n", 1)[0]))
+    multi = re.search(r"into each of these languages: (.+?)\.\n", prompt)
+    if multi:
+        body = re.search(r'Text: "(.*)"', prompt, re.DOTALL).group(1)
+        return json.dumps([{"language": lang, "translation": f"[{lang}] {body.strip()}"}
+                           for lang in multi.group(1).split(", ")], ensure_ascii=False)
+    if prompt.lstrip().startswith("Translate"):
+        # Translation-memory hints are reference material, not text to translate
+        prompt = re.sub(r"\n\nA similar text was translated before\..*?\nTranslation: \".*?\"", "", prompt, flags=re.DOTALL)
+        target = re.search(r" to (.+?)[:.]", prompt)
+        quoted = re.search(r'Text: "(.*)"', prompt, re.DOTALL)
+        body = quoted.group(1) if quoted else prompt.split("\n\n", 1)[-1].split(": ", 1)[-1]
+        return f"[{target.group(1) if target else 'translated'}] {body.strip()}"
+    length = re.search(r"Length: (\w+)", prompt)
+    words = LENGTH_WORDS.get(length.group(1) if length else "", 120)
+    return " ".join(LOREM[i % len(LOREM)] for i in range(words)).capitalize() + "."
+
+
+def _usage(prompt, text, cached_tokens=0):
+    prompt_tokens, output_tokens = count_tokens(prompt) + cached_tokens, count_tokens(text)
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        total_token_count=prompt_tokens + output_tokens,
+        cached_content_token_count=cached_tokens or None,
+    )
+
+
+def _response(text, usage=None, finish_reason=None):
+    return SimpleNamespace(text=text, usage_metadata=usage,
+                           candidates=[SimpleNamespace(finish_reason=finish_reason)] if finish_reason else [])
+
+
+def _cap(reply, config):
+    # (reply, finish reason): replies over config's max_output_tokens are cut off like the real API does
+    limit = config.get("max_output_tokens") if isinstance(config, dict) else None
+    if not limit or count_tokens(reply) <= limit:
+        return reply, "STOP"
+    return reply[:limit * 4], "MAX_TOKENS"
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    if isinstance(contents, (list, tuple)):
+        return "\n".join(_prompt_text(c) for c in contents)
+    if isinstance(contents, dict):
+        return "\n".join(p.get("text", "") for p in contents.get("parts", [])) if "parts" in contents \
+            else contents.get("text", "")
+    parts = getattr(contents, "parts", None)
+    if parts is not None:
+        return "\n".join(getattr(p, "text", "") or "" for p in parts)
+    return str(contents)
+
+
+# ---------------------------
+# In-process client with the google-genai surface the app uses
+# ---------------------------
+class FakeModel:
+    def __init__(self, latency=0.2, per_token_latency=0.002, stream_chunk_words=8, error_rate=0.0,
+                 error_every=0, jitter=0.2, seed=None):
+        self.latency = latency
+        self.per_token_latency = per_token_latency
+        self.stream_chunk_words = stream_chunk_words
+        self.error_rate = error_rate
+        self.error_every = error_every
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def plan(self, contents):
+        # Returns (prompt, reply, seconds); raises FakeAPIError when a rate-limit error is due
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+            fail = self.random.random() < self.error_rate
+            factor = self.random.uniform(1 - self.jitter, 1 + self.jitter)
+        if fail or (self.error_every and calls % self.error_every == 0):
+            raise FakeAPIError(429, "Simulated quota exceeded")
+        prompt = _prompt_text(contents)
+        reply = respond(prompt)
+        return prompt, reply, (self.latency + self.per_token_latency * count_tokens(reply)) * factor
+
+    def chunks(self, reply):
+        words = reply.split(" ")
+        step = max(1, self.stream_chunk_words)
+        return [" ".join(words[i:i + step]) + (" " if i + step < len(words) else "") for i in range(0, len(words), step)]
+
+
+class FakeCaches:
+    # client.caches: explicit context caches, refused below the real API's minimum size
+    def __init__(self, min_tokens=1024):
+        self.min_tokens = min_tokens
+        self._caches = {}
+        self._lock = threading.Lock()
+
+    def create(self, model, config=None):
+        config = config or {}
+        text = _prompt_text(config.get("system_instruction") or config.get("contents") or "")
+        if count_tokens(text) < self.min_tokens:
+            raise FakeAPIError(400, f"Cached content is too small. min_total_token_count={self.min_tokens}",
+                               status="INVALID_ARGUMENT")
+        expires = time.time() + float(str(config.get("ttl", "3600s")).rstrip("s"))
+        with self._lock:
+            name = f"cachedContents/fake-{len(self._caches) + 1}"
+            self._caches[name] = (model, text, expires)
+        return SimpleNamespace(name=name, model=model, expire_time=expires)
+
+    def delete(self, name, config=None):
+        with self._lock:
+            self._caches.pop(name, None)
+
+    def cached_tokens(self, config):
+        # Prompt tokens a generate call reads from its cached_content, 0 without one
+        name = (config or {}).get("cached_content") if isinstance(config, dict) else None
+        with self._lock:
+            entry = self._caches.get(name)
+        if entry is None:
+            if name:
+                raise FakeAPIError(404, f"{name} not found", status="NOT_FOUND")
+            return 0
+        return count_tokens(entry[1])
+
+
+class FakeAsyncCaches:
+    # client.aio.caches, sharing the sync client's caches
+    def __init__(self, caches):
+        self._caches = caches
+
+    async def create(self, model, config=None):
+        return self._caches.create(model, config)
+
+    async def delete(self, name, config=None):
+        self._caches.delete(name, config)
+
+
+class FakeModels:
+    def __init__(self, model, caches=None):
+        self._model = model
+        self._caches = caches or FakeCaches()
+
+    def generate_content(self, model, contents, config=None):
+        cached = self._caches.cached_tokens(config)
+        prompt, reply, seconds = self._model.plan(contents)
+        reply, finish_reason = _cap(reply, config)
+        time.sleep(seconds)
+        return _response(reply, _usage(prompt, reply, cached), finish_reason)
+
+    def generate_content_stream(self, model, contents, config=None):
+        cached = self._caches.cached_tokens(config)
+        prompt, reply, seconds = self._model.plan(contents)
+        reply, finish_reason = _cap(reply, config)
+        chunks = self._model.chunks(reply)
+        time.sleep(self._model.latency)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep((seconds - self._model.latency) / len(chunks))
+            last = i == len(chunks) - 1
+            yield _response(chunk, _usage(prompt, reply, cached) if last else None, finish_reason if last else None)
+
+    def count_tokens(self, model, contents, config=None):
+        return SimpleNamespace(total_tokens=count_tokens(_prompt_text(contents)))
+
+    def list(self, config=None):
+        return [SimpleNamespace(display_name=m["name"].split("/")[-1], supported_actions=["generateContent", "countTokens"],
+                                **m) for m in FAKE_MODELS]
+
+
+class FakeAsyncModels:
+    def __init__(self, model, caches=None):
+        self._model = model
+        self._caches = caches or FakeCaches()
+
+    async def generate_content(self, model, contents, config=None):
+        cached = self._caches.cached_tokens(config)
+        prompt, reply, seconds = self._model.plan(contents)
+        reply, finish_reason = _cap(reply, config)
+        await asyncio.sleep(seconds)
+        return _response(reply, _usage(prompt, reply, cached), finish_reason)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        cached = self._caches.cached_tokens(config)
+        prompt, reply, seconds = self._model.plan(contents)
+        reply, finish_reason = _cap(reply, config)
+        chunks = self._model.chunks(reply)
+
+        async def stream():
+            await asyncio.sleep(self._model.latency)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep((seconds - self._model.latency) / len(chunks))
+                last = i == len(chunks) - 1
+                yield _response(chunk, _usage(prompt, reply, cached) if last else None,
+                                finish_reason if last else None)
+
+        return stream()
+
+    async def count_tokens(self, model, contents, config=None):
+        return SimpleNamespace(total_tokens=count_tokens(_prompt_text(contents)))
+
+
+class FakeClient:
+    def __init__(self, **options):
+        self.model = FakeModel(**options)
+        self.caches = FakeCaches()
+        self.models = FakeModels(self.model, self.caches)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self.model, self.caches), caches=FakeAsyncCaches(self.caches))
+
+
+def fake_recognizer(language=None, latency=0.3, seconds_per_word=0.4):
+    # Transcribes AudioData into placeholder words, one per `seconds_per_word` of audio
+    def recognize(audio):
+        duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        time.sleep(latency)
+        words = max(1, int(duration / seconds_per_word))
+        return " ".join(LOREM[i % len(LOREM)] for i in range(words))
+
+    return recognize
+
+
+# ---------------------------
+# HTTP server speaking the Gemini REST API (v1beta), for pointing a real genai.Client at
+# ---------------------------
+def _handler(model):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path.split("?")[0].rstrip("/").endswith("/models"):
+                self._send_json(200, {"models": [
+                    {"name": m["name"], "inputTokenLimit": m["input_token_limit"],
+                     "outputTokenLimit": m["output_token_limit"],
+                     "supportedGenerationMethods": ["generateContent", "countTokens"]} for m in FAKE_MODELS
+                ]})
+            else:
+                self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            contents = self._body().get("contents", [])
+            prompt = "\n".join(p.get("text", "") for c in contents for p in c.get("parts", []))
+            if path.endswith(":countTokens"):
+                return self._send_json(200, {"totalTokens": count_tokens(prompt)})
+            try:
+                prompt, reply, seconds = model.plan(prompt)
+            except FakeAPIError as e:
+                return self._send_json(e.code, e.details)
+            usage = _usage(prompt, reply)
+            usage_json = {"promptTokenCount": usage.prompt_token_count,
+                          "candidatesTokenCount": usage.candidates_token_count,
+                          "totalTokenCount": usage.total_token_count}
+
+            def payload(text, final):
+                item = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}]}
+                if final:
+                    item["candidates"][0]["finishReason"] = "STOP"
+                    item["usageMetadata"] = usage_json
+                return item
+
+            if path.endswith(":streamGenerateContent"):
+                chunks = model.chunks(reply)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                time.sleep(model.latency)
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        time.sleep((seconds - model.latency) / len(chunks))
+                    event = f"data: {json.dumps(payload(chunk, i == len(chunks) - 1))}\r\n\r\n"
+                    self.wfile.write(event.encode("utf-8"))
+                    self.wfile.flush()
+                self.close_connection = True
+            else:
+                time.sleep(seconds)
+                self._send_json(200, payload(reply, True))
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=8765, **options):
+    server = ThreadingHTTPServer((host, port), _handler(FakeModel(**options)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--per-token-latency", type=float, default=0.002)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, latency=args.latency, per_token_latency=args.per_token_latency,
+                   error_rate=args.error_rate)
+    print(f"Fake Gemini API on http://{args.host}:{args.port} — set GENAI_BASE_URL to use it")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
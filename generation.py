@@ -0,0 +1,13 @@
+# generation.py
+TONES = ["Professional", "Creative", "Casual", "Formal", "Friendly"]
+LENGTHS = ["Short", "Medium", "Long"]
+
+
+LENGTH_WORDS = {"Short": "about 150 words", "Medium": "about 400 words", "Long": "about 1000 words"}
+
+
+def generation_prompt(prompt, tone, length):
+    return (
+        f"Write a well-structured, engaging response. Tone: {tone}. Length: {length} ({LENGTH_WORDS[length]}).\n\n"
+        f"{prompt}"
+    )
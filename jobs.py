@@ -0,0 +1,273 @@
+# jobs.py
+# Background jobs for long voice and batch-sentiment runs. Jobs run on a worker pool outside the
+# request/rerun that submitted them, straight from the uploaded buffer. Status and every finished item are
+# kept in SQLite (the input itself is not), so progress can be polled after the page is gone and resubmitting
+# the same input resumes where it stopped.
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from languages import LANGUAGES
+
+CACHE_DIR = os.getenv("GENAI_CACHE_DIR", ".cache")
+JOB_WORKERS = int(os.getenv("GENAI_JOB_WORKERS", "2"))
+JOB_TTL = int(os.getenv("GENAI_JOB_TTL", str(7 * 24 * 3600)))      # seconds a job and its results are kept
+BATCH_SLICE = 100           # sentiment texts per stored step
+
+# Job kind -> telemetry feature its calls are attributed to
+KINDS = {"voice": "voice", "sentiment_batch": "sentiment"}
+ACTIVE = ("queued", "running")
+
+
+def job_id(kind, params, data):
+    # Same kind, options and input -> same ID, which is what lets a resubmission resume
+    digest = hashlib.sha256(kind.encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    digest.update(data)
+    return digest.hexdigest()[:20]
+
+
+def _failed(item):
+    # Voice segments carry an error message; sentiment rows that failed are labelled ERROR
+    return bool(item.get("error")) or item.get("sentiment") == "ERROR"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+# ---------------------------
+# Persistent store
+# ---------------------------
+class JobStore:
+    def __init__(self, path=None):
+        self.path = path or os.path.join(CACHE_DIR, "jobs.sqlite3")
+        self._lock = threading.Lock()
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, "
+            "total INTEGER, done INTEGER NOT NULL DEFAULT 0, error TEXT, stats TEXT, owner INTEGER, "
+            "created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            "job_id TEXT NOT NULL, idx INTEGER NOT NULL, result TEXT NOT NULL, seq INTEGER NOT NULL DEFAULT 0, "
+            "PRIMARY KEY (job_id, idx))"
+        )
+        # Stores from before `seq` existed get the column; their rows count as written first
+        if "seq" not in {row[1] for row in self._db.execute("PRAGMA table_info(job_items)")}:
+            self._db.execute("ALTER TABLE job_items ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+    def create(self, job_id, kind, params):
+        # Returns the existing job row when one exists
+        with self._lock:
+            row = self._get(job_id)
+            if row is None:
+                now = time.time()
+                self._db.execute(
+                    "INSERT INTO jobs (id, kind, status, params, created, updated) VALUES (?, ?, 'queued', ?, ?, ?)",
+                    (job_id, kind, json.dumps(params, ensure_ascii=False), now, now),
+                )
+                self._db.commit()
+        return row
+
+    def update(self, job_id, **fields):
+        fields["updated"] = time.time()
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE id = ?",
+                             (*fields.values(), job_id))
+            self._db.commit()
+
+    def add_item(self, job_id, index, result):
+        # `seq` orders a job's writes, so an item rewritten on resume (at any index) is seen as new
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_items (job_id, idx, result, seq) "
+                "VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM job_items WHERE job_id = ?))",
+                (job_id, index, json.dumps(result, ensure_ascii=False), job_id),
+            )
+            done = self._db.execute("SELECT COUNT(*) FROM job_items WHERE job_id = ?", (job_id,)).fetchone()[0]
+            self._db.execute("UPDATE jobs SET done = ?, updated = ? WHERE id = ?", (done, time.time(), job_id))
+            self._db.commit()
+
+    def items(self, job_id, after=-1):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT result FROM job_items WHERE job_id = ? AND idx > ? ORDER BY idx", (job_id, after)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def items_since(self, job_id, since=-1):
+        # (items written after write number `since`, in write order; the last write number seen)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, result FROM job_items WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, since)
+            ).fetchall()
+        return [json.loads(r[1]) for r in rows], rows[-1][0] if rows else since
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def list(self, limit=20):
+        with self._lock:
+            ids = [r[0] for r in self._db.execute("SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,))]
+            return [self._get(i) for i in ids]
+
+    def _get(self, job_id):
+        row = self._db.execute(
+            "SELECT id, kind, status, params, total, done, error, stats, owner, created, updated FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "kind", "status", "params", "total", "done", "error", "stats", "owner", "created", "updated")
+        job = dict(zip(keys, row))
+        job["params"] = json.loads(job["params"])
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        return job
+
+    def recover(self):
+        # Jobs left active by a process that no longer exists are marked interrupted
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, owner FROM jobs WHERE status IN ({', '.join('?' * len(ACTIVE))})", ACTIVE
+            ).fetchall()
+            stale = [job_id for job_id, owner in rows if not owner or not _pid_alive(owner)]
+            self._db.executemany("UPDATE jobs SET status = 'interrupted' WHERE id = ?", [(i,) for i in stale])
+            self._db.commit()
+        return stale
+
+    def prune(self, max_age=JOB_TTL):
+        cutoff = time.time() - max_age
+        with self._lock:
+            old = [r[0] for r in self._db.execute("SELECT id FROM jobs WHERE updated < ?", (cutoff,))]
+            self._db.executemany("DELETE FROM job_items WHERE job_id = ?", [(i,) for i in old])
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in old])
+            self._db.commit()
+        return len(old)
+
+
+# ---------------------------
+# Queue
+# ---------------------------
+class JobQueue:
+    def __init__(self, service, store=None, max_workers=JOB_WORKERS):
+        self.service = service
+        self.store = store or JobStore()
+        self.store.recover()
+        self.store.prune()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="genai-job")
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def submit_voice(self, data, filename, source_lang="Auto Detect", target_lang="English"):
+        if source_lang not in LANGUAGES or target_lang not in LANGUAGES or target_lang == "Auto Detect":
+            raise ValueError(f"Unknown language pair '{source_lang}' -> '{target_lang}'")
+        params = {"filename": filename or "", "source_lang": source_lang, "target_lang": target_lang}
+        return self._submit("voice", params, bytes(data))
+
+    def submit_sentiment_batch(self, texts):
+        if not isinstance(texts, list) or not texts:
+            raise ValueError("'texts' must be a non-empty list")
+        self.service.check_sentiment_texts(texts)
+        return self._submit("sentiment_batch", {}, json.dumps(texts, ensure_ascii=False).encode("utf-8"))
+
+    def _submit(self, kind, params, data):
+        if not data:
+            raise ValueError("Job input is empty")
+        job = job_id(kind, params, data)
+        existing = self.store.create(job, kind, params)
+        if existing and existing["status"] == "done" and not any(_failed(i) for i in self.store.items(job)):
+            return job
+        if existing and existing["status"] in ACTIVE and existing["owner"] and existing["owner"] != os.getpid() \
+                and _pid_alive(existing["owner"]):
+            return job      # another process (e.g. an API worker) is running it
+        self.resume(job, data)
+        return job
+
+    def resume(self, job_id, data):
+        # Queues a stored job over its input `data`; finished items are kept and skipped.
+        # False if it is already running here.
+        with self._lock:
+            if job_id in self._running:
+                return False
+            self._running.add(job_id)
+        self.store.update(job_id, status="queued", owner=os.getpid(), error=None)
+        self._pool.submit(self._run, job_id, data)
+        return True
+
+    def status(self, job_id, after=-1):
+        # Job row plus the items finished after index `after`, or None for an unknown ID
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job.pop("owner")
+        return {**job, "items": self.store.items(job_id, after)}
+
+    def changes(self, job_id, since=-1):
+        # Job row plus the items written after cursor `since` (including rewrites of earlier indices) and
+        # the cursor to pass next time, or None for an unknown ID
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        job.pop("owner")
+        items, cursor = self.store.items_since(job_id, since)
+        return {**job, "items": items, "cursor": cursor}
+
+    def _run(self, job_id, data):
+        job = self.store.get(job_id)
+        try:
+            self.store.update(job_id, status="running")
+            run = self._run_voice if job["kind"] == "voice" else self._run_sentiment
+            with telemetry.scope(KINDS[job["kind"]]):
+                run(job_id, job["params"], data)
+        except Exception as e:
+            self.store.update(job_id, status="failed", error=f"{type(e).__name__}: {e}")
+        else:
+            self.store.update(job_id, status="done")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _run_voice(self, job_id, params, data):
+        # Segments that failed before are retried; the rest are skipped without ASR or translation
+        from audio_pipeline import ByteMeter
+
+        finished = {item["index"] for item in self.store.items(job_id) if not _failed(item)}
+        meter = ByteMeter()
+        for segment in self.service.voice_translate(data, params["filename"], params["source_lang"],
+                                                    params["target_lang"], meter=meter, skip=finished):
+            self.store.add_item(job_id, segment["index"], segment)
+        self.store.update(job_id, total=len(self.store.items(job_id)),
+                          stats=json.dumps({"bytes": meter.stages, "vad": meter.vad_stats(),
+                                            "resumed_segments": len(finished)}))
+
+    def _run_sentiment(self, job_id, params, data):
+        # Rows that came back as ERROR are retried, like failed voice segments
+        texts = json.loads(data)
+        self.store.update(job_id, total=len(texts))
+        finished = {item["index"] for item in self.store.items(job_id) if not _failed(item)}
+        pending = [i for i in range(len(texts)) if i not in finished]
+        for start in range(0, len(pending), BATCH_SLICE):
+            indices = pending[start:start + BATCH_SLICE]
+            for index, row in zip(indices, self.service.sentiment_batch([texts[i] for i in indices])):
+                self.store.add_item(job_id, index, {**row, "index": index})
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
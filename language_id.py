@@ -0,0 +1,76 @@
+# language_id.py
+# Local language identification from the Unicode script. Only a script that belongs to one language
+# resolves "Auto Detect" before any API call; languages that share a script (Latin, Devanagari, Arabic)
+# are left to the model.
+import unicodedata
+
+from languages import LANGUAGES
+
+MAX_CHARS = 2000            # longer texts are identified from their beginning
+MIN_LETTERS = 3
+
+# Scripts that identify a single app language
+UNIQUE_SCRIPTS = {
+    "TELUGU": "Telugu", "TAMIL": "Tamil", "KANNADA": "Kannada", "MALAYALAM": "Malayalam",
+    "BENGALI": "Bengali", "GUJARATI": "Gujarati", "GURMUKHI": "Punjabi", "ORIYA": "Odia",
+    "SINHALA": "Sinhala", "THAI": "Thai", "GREEK": "Greek", "CYRILLIC": "Russian", "HANGUL": "Korean",
+}
+# Characters that only occur in one of the two Chinese standards
+_SIMPLIFIED = set("这们说时个来为会对过还没进发经东国电问学长车门见关开两热给应让认们书")
+_TRADITIONAL = set("這們說時個來為會對過還沒進發經東國電問學長車門見關開兩熱給應讓認們書")
+
+
+# ---------------------------
+# Scripts
+# ---------------------------
+def _script(char):
+    try:
+        name = unicodedata.name(char)
+    except ValueError:
+        return None
+    if name.startswith("CJK"):
+        return "HAN"
+    if name.startswith(("HIRAGANA", "KATAKANA")):
+        return "KANA"
+    return name.split(" ", 1)[0]
+
+
+def dominant_script(text):
+    counts = {}
+    for char in text:
+        if char.isalpha():
+            script = _script(char)
+            if script:
+                counts[script] = counts.get(script, 0) + 1
+    return max(counts, key=counts.get) if counts else None, counts
+
+
+# ---------------------------
+# Identification
+# ---------------------------
+def script_language(text):
+    # The language the text's script settles on its own (Telugu, Korean, kana -> Japanese, ...), else None
+    text = text[:MAX_CHARS]
+    script, counts = dominant_script(text)
+    if script is None or sum(counts.values()) < MIN_LETTERS:
+        return None
+    if script in UNIQUE_SCRIPTS:
+        return UNIQUE_SCRIPTS[script]
+    if script in ("HAN", "KANA"):
+        if counts.get("KANA"):
+            return "Japanese"
+        simplified = sum(c in _SIMPLIFIED for c in text)
+        traditional = sum(c in _TRADITIONAL for c in text)
+        if simplified != traditional:
+            return "Chinese (Traditional)" if traditional > simplified else "Chinese (Simplified)"
+    return None
+
+
+def resolve_source(text, source_lang):
+    # Replaces "Auto Detect" only when the script alone identifies the language. Shared scripts (Latin,
+    # Devanagari, Arabic) stay "Auto Detect" for the model: a wrong local guess would skip translation when it
+    # equals the target and would key the translation memory under the wrong pair.
+    if source_lang != "Auto Detect":
+        return source_lang
+    language = script_language(text)
+    return language if language in LANGUAGES else source_lang
@@ -0,0 +1,53 @@
+# languages.py
+LANGUAGES = {
+    "Auto Detect": None,
+    "English": "en",
+    "Telugu": "te",
+    "Hindi": "hi",
+    "Spanish": "es",
+    "French": "fr",
+    "German": "de",
+    "Portuguese": "pt",
+    "Russian": "ru",
+    "Italian": "it",
+    "Dutch": "nl",
+    "Bengali": "bn",
+    "Urdu": "ur",
+    "Arabic": "ar",
+    "Punjabi": "pa",
+    "Tamil": "ta",
+    "Kannada": "kn",
+    "Malayalam": "ml",
+    "Marathi": "mr",
+    "Gujarati": "gu",
+    "Odia": "or",
+    "Nepali": "ne",
+    "Sinhala": "si",
+    "Vietnamese": "vi",
+    "Thai": "th",
+    "Indonesian": "id",
+    "Malay": "ms",
+    "Swahili": "sw",
+    "Polish": "pl",
+    "Czech": "cs",
+    "Romanian": "ro",
+    "Hungarian": "hu",
+    "Greek": "el",
+    "Turkish": "tr",
+    "Korean": "ko",
+    "Japanese": "ja",
+    "Chinese (Simplified)": "zh-CN",
+    "Chinese (Traditional)": "zh-TW",
+}
+
+# Derived tables, built once per process on first import
+LANGUAGE_NAMES = list(LANGUAGES.keys())
+DEFAULT_TARGET_INDEX = LANGUAGE_NAMES.index("Telugu") if "Telugu" in LANGUAGES else 1
+
+# Translator example phrases (text -> language) and the targets they are prefetched into while idle
+EXAMPLE_TEXTS = {
+    "Hello, how are you?": "English",
+    "नमस्ते, आप कैसे हैं?": "Hindi",
+    "Hola, ¿cómo estás?": "Spanish",
+}
+POPULAR_TARGETS = ["Telugu", "English", "Hindi", "Spanish", "French", "Tamil"]
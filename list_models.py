@@ -1,10 +1,98 @@
-from google import genai
-from dotenv import load_dotenv
+# list_models.py
+# Lists available models (from the on-disk registry) and the current routing table,
+# or benchmarks each model against a fixed prompt set.
+#   python list_models.py
+#   python list_models.py --refresh
+#   python list_models.py --benchmark --repeat 5 --concurrency 4
+import argparse
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from backends import create_backend
+from generation import generation_prompt
+from model_registry import CACHE_DIR, TIERS, ModelRegistry, ModelRouter
+from percentiles import percentile
+from sentiment import single_prompt
+from translation import translation_prompt
+
+# One prompt per routed workload
+PROMPT_SET = [
+    ("sentiment", single_prompt("The package arrived late, but support sorted it out quickly.")),
+    ("translation", translation_prompt("Where is the nearest train station?", "English", "Hindi")),
+    ("generation", generation_prompt("Write a short product update for a note-taking app", "Professional", "Short")),
+]
+
+
+def benchmark_model(client, model, repeat, concurrency):
+    latencies, output_tokens, errors = [], 0, 0
+
+    def one(prompt):
+        nonlocal output_tokens, errors
+        start = time.perf_counter()
+        try:
+            resp = client.models.generate_content(model=model, contents=prompt)
+        except Exception:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - start)
+        usage = getattr(resp, "usage_metadata", None)
+        output_tokens += (getattr(usage, "candidates_token_count", None) or 0) if usage else 0
+
+    prompts = [prompt for _ in range(repeat) for _, prompt in PROMPT_SET]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, prompts))
+    wall = time.perf_counter() - start
+    return {
+        "model": model,
+        "ok": len(latencies),
+        "errors": errors,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "req_s": len(latencies) / wall if wall else 0.0,
+        "tok_s": output_tokens / wall if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List, route and benchmark Gemini models")
+    parser.add_argument("--backend", default=os.getenv("GENAI_BACKEND", "gemini"), choices=["gemini", "fake"])
+    parser.add_argument("--refresh", action="store_true", help="re-list models instead of using the disk cache")
+    parser.add_argument("--benchmark", action="store_true", help="measure latency and throughput per model")
+    parser.add_argument("--models", help="comma-separated models to benchmark (default: every tier model available)")
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the prompt set per model")
+    parser.add_argument("--concurrency", type=int, default=3)
+    args = parser.parse_args()
+
+    load_dotenv()
+    backend = create_backend(args.backend, api_key=os.getenv("GEMINI_API_KEY")) if args.backend == "gemini" \
+        else create_backend(args.backend)
+    registry = ModelRegistry(backend.client, path=os.path.join(CACHE_DIR, f"models-{backend.name}.json"))
+    models = registry.models(force=args.refresh)
+
+    if not args.benchmark:
+        for m in models:
+            print(m["name"])
+        print("\nRouting:")
+        for route, model in ModelRouter(registry).table().items():
+            print(f"  {route:<18}{model}")
+        return
+
+    available = {m["name"] for m in models}
+    if args.models:
+        selected = [m.strip() for m in args.models.split(",") if m.strip()]
+    else:
+        selected = [name for tier in TIERS.values() for name in tier if name in available]
+    print(f"{len(PROMPT_SET)} prompts x {args.repeat} passes, concurrency {args.concurrency}")
+    print(f"{'model':<36}{'ok':>5}{'err':>5}{'p50 s':>9}{'p95 s':>9}{'req/s':>9}{'tok/s':>9}")
+    for model in selected:
+        r = benchmark_model(backend.client, model, args.repeat, args.concurrency)
+        print(f"{r['model']:<36}{r['ok']:>5}{r['errors']:>5}{r['p50']:>9.3f}{r['p95']:>9.3f}"
+              f"{r['req_s']:>9.2f}{r['tok_s']:>9.1f}")
 
-load_dotenv()
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
-models = client.models.list()
-for m in models:
-    print(m.name)
+if __name__ == "__main__":
+    main()
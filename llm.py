@@ -0,0 +1,137 @@
+# llm.py
+import time
+
+import telemetry
+from dispatcher import DeadlineExceeded, StreamInterrupted, get_dispatcher
+from response_cache import default_cache, make_key
+from singleflight import get_singleflight
+
+DEFAULT_MODEL = "models/gemini-2.5-flash"
+
+
+class OutputTruncated(RuntimeError):
+    # The reply stopped at max_output_tokens; the partial text is neither returned nor cached
+    pass
+
+
+def _finish_reason(resp):
+    candidates = getattr(resp, "candidates", None) or []
+    reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+    # google-genai returns a FinishReason enum, the fake backend a plain string
+    return getattr(reason, "name", reason)
+
+
+def _truncated(config):
+    limit = config.get("max_output_tokens") if isinstance(config, dict) else None
+    cap = f"the {limit:,}-token" if limit else "the model's"
+    return OutputTruncated(f"The reply was cut off at {cap} output limit")
+
+
+def _suppressed(metrics):
+    metrics["coalesced"] = True
+    telemetry.registry.inc("genai_singleflight_suppressed_total", feature=telemetry.current_feature())
+
+
+def generate_text(client, prompt, model=DEFAULT_MODEL, config=None, use_cache=True, accept=None, deadline=None,
+                  metrics=None):
+    metrics = {} if metrics is None else metrics
+    cache = default_cache() if use_cache else None
+    key = make_key(model, prompt, config)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            metrics["cached"] = True
+            telemetry.record_call(model, cached=True)
+            return cached
+
+    metrics["cached"] = False
+
+    def call():
+        with telemetry.stage("network"):
+            resp = get_dispatcher().generate(client, model, prompt, config=config, deadline=deadline)
+        telemetry.record_call(model, getattr(resp, "usage_metadata", None))
+        if _finish_reason(resp) == "MAX_TOKENS":
+            raise _truncated(config)
+        text = resp.text or ""
+        # Empty replies are usually blocked or truncated output, not worth keeping;
+        # `accept` lets callers keep malformed replies out of the cache too
+        if cache and text.strip() and (accept is None or accept(text)):
+            cache.set(key, text)
+        return text
+
+    # Identical prompts already in flight (another session clicking the same example) share one call
+    text, shared = get_singleflight().do(key, call, timeout=deadline)
+    if shared:
+        _suppressed(metrics)
+    return text
+
+
+def stream_text(client, prompt, model=DEFAULT_MODEL, config=None, use_cache=True, metrics=None, deadline=None):
+    # Yields text chunks as they arrive; fills `metrics` with time-to-first-token and total latency
+    metrics = {} if metrics is None else metrics
+    start = time.perf_counter()
+    cache = default_cache() if use_cache else None
+    key = make_key(model, prompt, config)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.update(ttft=time.perf_counter() - start, total=time.perf_counter() - start, cached=True)
+            telemetry.record_call(model, cached=True)
+            yield cached
+            return
+
+    flight, leader = get_singleflight().acquire(key)
+    if not leader:
+        try:
+            full = get_singleflight().wait(flight, timeout=deadline)
+        except StreamInterrupted:
+            # The leader's stream broke or was abandoned part-way; stream on our own instead
+            pass
+        except DeadlineExceeded:
+            # The leader's deadline only bounds its first chunk and idle gaps, so a long reply can outlast
+            # our wait while still arriving; stream on our own rather than fail. A leader that itself
+            # exceeded its deadline has finished, and that error is ours too.
+            if flight.done.is_set():
+                raise
+        else:
+            _suppressed(metrics)
+            metrics.update(ttft=time.perf_counter() - start, total=time.perf_counter() - start, cached=False)
+            yield full
+            return
+
+    parts = []
+    usage = finish_reason = None
+    try:
+        for chunk in get_dispatcher().stream(client, model, prompt, config=config, deadline=deadline):
+            # Usage metadata and the finish reason arrive with the final chunk
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            finish_reason = _finish_reason(chunk) or finish_reason
+            text = chunk.text or ""
+            if not text:
+                continue
+            if not parts:
+                metrics["ttft"] = time.perf_counter() - start
+            parts.append(text)
+            yield text
+
+        # Still inside the try: whatever fails here must release the flight, or waiters hang until their deadline
+        full = "".join(parts)
+        metrics.update(total=time.perf_counter() - start, cached=False, chunks=len(parts))
+        metrics.setdefault("ttft", metrics["total"])
+        telemetry.record_stage("network", metrics["total"])
+        telemetry.record_call(model, usage)
+        if finish_reason == "MAX_TOKENS":
+            # The partial text has been shown already; the caller learns it is incomplete
+            raise _truncated(config)
+        if cache and full.strip():
+            cache.set(key, full)
+    except GeneratorExit:
+        if leader:
+            get_singleflight().release(key, flight, error=StreamInterrupted("shared stream closed before the end"))
+        raise
+    except BaseException as e:
+        if leader:
+            get_singleflight().release(key, flight, error=e)
+        raise
+    if leader:
+        get_singleflight().release(key, flight, result=full)
@@ -0,0 +1,146 @@
+# model_registry.py
+import json
+import os
+import threading
+import time
+
+from llm import DEFAULT_MODEL
+from prompt_budget import estimate_tokens
+
+CACHE_DIR = os.getenv("GENAI_CACHE_DIR", ".cache")
+REFRESH_SECONDS = int(os.getenv("GENAI_MODELS_REFRESH", str(24 * 3600)))
+
+# Preferred models per tier, cheapest/fastest first within each tier
+TIERS = {
+    "small": ["models/gemini-2.5-flash-lite", "models/gemini-flash-lite-latest", "models/gemini-2.0-flash-lite"],
+    "medium": ["models/gemini-2.5-flash", "models/gemini-flash-latest", "models/gemini-2.0-flash"],
+    "large": ["models/gemini-2.5-pro", "models/gemini-pro-latest"],
+}
+# Tiers tried, in order, when nothing from the wanted tier is available
+FALLBACK = {"small": ["small", "medium", "large"], "medium": ["medium", "small", "large"],
+            "large": ["large", "medium", "small"]}
+
+# Prompts up to this size count as short for classification and translation
+SHORT_PROMPT_TOKENS = 1000
+# Generation prompts above this size go to the large tier even when the length isn't "Long"
+LONG_PROMPT_TOKENS = 4000
+
+# Route -> tier (or model name). Only long or "Long"-length generation reaches the large tier.
+DEFAULT_ROUTES = {
+    "sentiment": "small",
+    "sentiment_long": "medium",
+    "translation": "small",
+    "translation_long": "medium",
+    "generation": "medium",
+    "generation_long": "large",
+    "chat_summary": "small",
+}
+# Per-feature overrides, a model name or a tier:
+#   GENAI_MODEL_ROUTES='{"sentiment": "models/gemini-2.5-flash", "generation_long": "medium"}'
+ROUTES = {**DEFAULT_ROUTES, **json.loads(os.getenv("GENAI_MODEL_ROUTES", "{}"))}
+
+
+# ---------------------------
+# Registry: client.models.list(), cached on disk
+# ---------------------------
+class ModelRegistry:
+    def __init__(self, client, path=None, refresh=REFRESH_SECONDS):
+        self.client = client
+        self.path = path or os.path.join(CACHE_DIR, "models.json")
+        self.refresh = refresh
+        self._models = None
+        self._fetched = 0.0
+        self._lock = threading.Lock()
+
+    def models(self, force=False):
+        # [{"name", "input_token_limit", "output_token_limit", "supported_actions"}, ...]
+        with self._lock:
+            if self._models is None and not force:
+                self._load()
+            if force or self._models is None or time.time() - self._fetched > self.refresh:
+                self._fetch()
+            return list(self._models or [])
+
+    def names(self):
+        return {m["name"] for m in self.models() if "generateContent" in (m["supported_actions"] or ["generateContent"])}
+
+    def limits(self, name):
+        # (input_token_limit, output_token_limit) for a model, (None, None) when unknown
+        for m in self.models():
+            if m["name"] == name:
+                return m["input_token_limit"], m["output_token_limit"]
+        return None, None
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self._models, self._fetched = data.get("models"), data.get("fetched", 0.0)
+
+    def _fetch(self):
+        try:
+            models = [
+                {
+                    "name": m.name,
+                    "input_token_limit": getattr(m, "input_token_limit", None),
+                    "output_token_limit": getattr(m, "output_token_limit", None),
+                    "supported_actions": list(getattr(m, "supported_actions", None) or []),
+                }
+                for m in self.client.models.list()
+            ]
+        except Exception:
+            # Keep serving the stale list (or the built-in tiers) rather than failing requests;
+            # retry after another refresh interval
+            self._fetched = time.time()
+            return
+        self._models, self._fetched = models, time.time()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"fetched": self._fetched, "models": models}, f, indent=1)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+
+# ---------------------------
+# Routing policy
+# ---------------------------
+class ModelRouter:
+    def __init__(self, registry, routes=None, short_tokens=SHORT_PROMPT_TOKENS, long_tokens=LONG_PROMPT_TOKENS):
+        self.registry = registry
+        self.routes = ROUTES if routes is None else {**DEFAULT_ROUTES, **routes}
+        self.short_tokens = short_tokens
+        self.long_tokens = long_tokens
+
+    def tier_model(self, tier):
+        available = self.registry.names()
+        if not available:
+            # Unknown (listing failed and nothing cached): trust the preference table
+            return TIERS[tier][0]
+        for candidate in FALLBACK[tier]:
+            for name in TIERS[candidate]:
+                if name in available:
+                    return name
+        return DEFAULT_MODEL
+
+    def resolve(self, target):
+        # A route is either a tier name or a literal model name
+        return self.tier_model(target) if target in TIERS else target
+
+    def route(self, feature, text="", length=None):
+        tokens = estimate_tokens(text) if text else 0
+        if feature == "generation":
+            long = length == "Long" or tokens > self.long_tokens
+        else:
+            # Classification and translation: short inputs go to the cheapest tier
+            long = tokens > self.short_tokens
+        # Features without a `_long` route use their base route for every input size
+        target = self.routes.get(f"{feature}_long", self.routes[feature]) if long else self.routes[feature]
+        return self.resolve(target)
+
+    def table(self):
+        return {key: self.resolve(target) for key, target in self.routes.items()}
@@ -0,0 +1,11 @@
+# percentiles.py
+# Nearest-rank percentiles for latency reports. Kept free of heavy imports so tools like
+# list_models.py can use it without loading the audio stack.
+import math
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
@@ -0,0 +1,248 @@
+# prefetch.py
+# Work started before it is asked for. Speech for a translation is synthesized in the background as soon as
+# the text exists, and while the app is idle the example phrases are translated and voiced in the popular
+# target languages, within a budget. Every speculative result that a user later asks for counts as a hit.
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+import telemetry
+
+WORKERS = int(os.getenv("GENAI_PREFETCH_WORKERS", "2"))
+IDLE_SECONDS = float(os.getenv("GENAI_PREFETCH_IDLE", "5"))     # quiet time before speculative work starts
+BUDGET = int(os.getenv("GENAI_PREFETCH_BUDGET", "40"))          # speculative tasks per window; 0 disables
+WINDOW = int(os.getenv("GENAI_PREFETCH_WINDOW", "3600"))        # seconds
+MAX_WARMED = 4096           # speculative results remembered for hit accounting
+
+URGENT, SPECULATIVE = 0, 1
+
+
+def _normalize(text):
+    return " ".join(str(text).split())
+
+
+class _Task:
+    def __init__(self, kind, fn, priority, charged=True):
+        self.kind = kind
+        self.fn = fn
+        self.priority = priority
+        self.charged = charged      # counts against the speculative budget
+        self.future = Future()
+        self.started = False
+
+
+class Prefetcher:
+    def __init__(self, service, workers=WORKERS, budget=BUDGET, window=WINDOW, idle_seconds=IDLE_SECONDS):
+        self.service = service
+        self.budget = budget
+        self.window = window
+        self.idle_seconds = idle_seconds
+        self._queue = []                # heap of (priority, seq, key); stale entries are skipped
+        self._tasks = {}                # key -> _Task, queued or running
+        self._warmed = OrderedDict()    # keys finished speculatively -> True until someone asks for them
+        self._spent = deque()           # start times of speculative tasks inside the window
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._last_activity = time.monotonic()
+        self._closed = False
+        self._running_speculative = 0
+        self.counters = {"urgent": 0, "speculative": 0, "warmed": 0, "hits": 0, "speech_hits": 0, "errors": 0,
+                         "over_budget": 0}
+        # One worker is always left for urgent speech, so it never queues behind speculative work
+        self._speculative_slots = max(1, workers - 1)
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"genai-prefetch-{i}", daemon=True).start()
+
+    # ---------------------------
+    # What the UI calls
+    # ---------------------------
+    def translate(self, text, source_lang, target_lang):
+        # Runs in the caller's thread; a speculative run already in progress for the pair is waited for instead.
+        # The key carries the source as sent, so only a request the warmed call would have answered matches it.
+        key = ("translation", _normalize(text), source_lang, target_lang)
+        with self._cond:
+            self._last_activity = time.monotonic()
+            self.counters["urgent"] += 1
+            warmed = self._warmed.get(key)
+            if warmed:
+                self._warmed[key] = False
+            task = self._tasks.get(key)
+            if task is not None and not task.started:
+                # Queued but not started: run it here and let the worker skip it
+                task.started = True
+                del self._tasks[key]
+                task.future.set_result(None)
+                task = None
+        # None when the task was dropped over budget
+        result = task.future.result() if task is not None else None
+        if result is not None:
+            with self._cond:
+                self._hit(key)
+            return result
+        result = self.service.translate(text, source_lang, target_lang)
+        if warmed and result.get("memory") and result["memory"]["kind"] != "hint":
+            # Counted only when the warmed translation was actually served, not recomputed
+            with self._cond:
+                self._hit(key)
+        return result
+
+    def speech(self, text, target_lang):
+        # Future for the speech bytes, started at once; the caller renders the text while it runs
+        key = ("speech", _normalize(text), target_lang)
+        return self._submit(key, lambda: self.service.speech(text, target_lang), URGENT)
+
+    def warm(self, texts, target_langs, source_lang="Auto Detect"):
+        # Queues a translation for every (text, target) pair, and its speech once the text exists; runs only
+        # while idle and within budget. `texts` maps each text to its language. They are translated from
+        # `source_lang`, the source the UI will send, so a later translate() makes the very same call; texts
+        # in another language than an explicit source are skipped. Pairs already warmed or queued are not
+        # queued again.
+        for text, lang in texts.items():
+            if source_lang not in ("Auto Detect", lang):
+                continue
+            for target_lang in target_langs:
+                if target_lang != lang:
+                    key = ("translation", _normalize(text), source_lang, target_lang)
+                    self._submit(key, lambda t=text, s=source_lang, g=target_lang: self._warm_translation(t, s, g),
+                                 SPECULATIVE)
+
+    def _warm_translation(self, text, source_lang, target_lang):
+        # The result lands in the translation memory, the speech in the TTS cache. Speech is its own task,
+        # so a user waiting on this translation gets the text without waiting for (or failing with) TTS.
+        result = self.service.translate(text, source_lang, target_lang)
+        translation = result["translation"]
+        # Part of the same warmed pair, so it doesn't spend budget of its own
+        self._submit(("speech", _normalize(translation), target_lang),
+                     lambda: self.service.speech(translation, target_lang), SPECULATIVE, charged=False)
+        return result
+
+    # ---------------------------
+    # Scheduling
+    # ---------------------------
+    def _submit(self, key, fn, priority, charged=True):
+        with self._cond:
+            if priority == URGENT:
+                self._last_activity = time.monotonic()
+                self.counters["urgent"] += 1
+                if self._warmed.get(key):
+                    self._warmed[key] = False
+                    self._hit(key)
+            task = self._tasks.get(key)
+            if task is not None:
+                if priority < task.priority and not task.started:
+                    # Someone is now waiting on a queued speculative task: move it to the front
+                    task.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._seq), key))
+                    self._cond.notify()
+                elif priority < task.priority:
+                    self._hit(key)      # already running speculatively; the wait is shorter than a fresh call
+                return task.future
+            if priority == SPECULATIVE and (key in self._warmed or charged and not self._budget_left()):
+                future = Future()
+                future.set_result(None)
+                return future
+            if priority == SPECULATIVE:
+                self.counters["speculative"] += 1
+            task = self._tasks[key] = _Task(key[0], fn, priority, charged)
+            heapq.heappush(self._queue, (priority, next(self._seq), key))
+            self._cond.notify()
+            return task.future
+
+    def _next(self):
+        # (key, task) to run now, or the seconds to wait before looking again
+        while self._queue:
+            priority, _, key = self._queue[0]
+            task = self._tasks.get(key)
+            if task is None or task.started or task.priority != priority:
+                heapq.heappop(self._queue)
+                continue
+            if priority == SPECULATIVE:
+                if self._running_speculative >= self._speculative_slots:
+                    return None
+                now = time.monotonic()
+                quiet = now - self._last_activity
+                if quiet < self.idle_seconds:
+                    return self.idle_seconds - quiet
+                if task.charged and not self._budget_left():
+                    # Out of budget: drop the speculative backlog rather than let it pile up
+                    heapq.heappop(self._queue)
+                    del self._tasks[key]
+                    task.future.set_result(None)
+                    self.counters["over_budget"] += 1
+                    continue
+                if task.charged:
+                    self._spent.append(now)
+                self._running_speculative += 1
+            heapq.heappop(self._queue)
+            task.started = True
+            return key, task
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    picked = self._next()
+                    if isinstance(picked, tuple):
+                        break
+                    self._cond.wait(picked)
+            key, task = picked
+            try:
+                result, error = task.fn(), None
+            except Exception as e:
+                result, error = None, e
+            with self._cond:
+                self._tasks.pop(key, None)
+                if task.priority == SPECULATIVE:
+                    self._running_speculative -= 1
+                    self._cond.notify_all()
+                if error is not None:
+                    self.counters["errors"] += 1
+                    self._count(task.kind, "error")
+                elif task.priority == SPECULATIVE:
+                    self._remember(key)
+            if error is not None:
+                task.future.set_exception(error)
+            else:
+                task.future.set_result(result)
+
+    def _budget_left(self):
+        now = time.monotonic()
+        while self._spent and now - self._spent[0] > self.window:
+            self._spent.popleft()
+        return max(0, self.budget - len(self._spent))
+
+    def _remember(self, key):
+        self._warmed[key] = True
+        self._warmed.move_to_end(key)
+        while len(self._warmed) > MAX_WARMED:
+            self._warmed.popitem(last=False)
+        if key[0] == "translation":
+            self.counters["warmed"] += 1
+        self._count(key[0], "warmed")
+
+    def _hit(self, key):
+        self.counters["hits" if key[0] == "translation" else "speech_hits"] += 1
+        self._count(key[0], "hit")
+
+    def _count(self, kind, outcome):
+        telemetry.registry.inc("genai_prefetch_total", kind=kind, outcome=outcome)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self.counters, queued=len(self._tasks), unused=sum(self._warmed.values()),
+                         budget_left=self._budget_left())
+        # Share of warmed (text, target) pairs that a user later translated
+        stats["hit_rate"] = stats["hits"] / stats["warmed"] if stats["warmed"] else 0.0
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,157 @@
+# prompt_budget.py
+# Token estimation, per-feature input/output budgets, and a report of the tokens the compact
+# prompt templates save over the original indented ones.
+#   python prompt_budget.py
+#   python prompt_budget.py --count        # exact counts from the API instead of the local estimate
+import argparse
+import json
+import math
+import os
+
+import telemetry
+
+# Largest user input, in estimated tokens, each feature accepts. Documents are segmented before sending.
+DEFAULT_INPUT_BUDGETS = {
+    "sentiment": 2000,
+    "translation": 4000,
+    "document": 200000,
+    "generation": 4000,
+    "chat_context": 32000,      # reference material kept in a chat session's cached preamble
+}
+# Output caps (max_output_tokens). They include headroom for models that think before answering.
+LENGTH_OUTPUT_TOKENS = {"Short": 1024, "Medium": 2048, "Long": 8192}
+DEFAULT_OUTPUT_BUDGETS = {
+    "sentiment": 2048,
+    "sentiment_batch": 256,     # per row, on top of the single-text cap
+    "translation": 2048,        # floor; long inputs get 3x their estimated size
+    "chat_summary": 1024,
+}
+# Overrides, e.g. GENAI_PROMPT_BUDGETS='{"generation": 8000}' and GENAI_OUTPUT_BUDGETS='{"Long": 16384}'
+INPUT_BUDGETS = {**DEFAULT_INPUT_BUDGETS, **json.loads(os.getenv("GENAI_PROMPT_BUDGETS", "{}"))}
+OUTPUT_BUDGETS = {**DEFAULT_OUTPUT_BUDGETS, **LENGTH_OUTPUT_TOKENS, **json.loads(os.getenv("GENAI_OUTPUT_BUDGETS", "{}"))}
+
+
+class PromptTooLarge(ValueError):
+    pass
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for Latin text; other scripts tokenize much finer
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+# ---------------------------
+# Budgets
+# ---------------------------
+def check_input(feature, text, input_limit=None):
+    # Rejects input over the feature budget (or the model's own input limit) before anything is sent;
+    # returns the estimated token count
+    tokens = estimate_tokens(text)
+    budget = INPUT_BUDGETS[feature]
+    if input_limit:
+        budget = min(budget, input_limit)
+    if tokens > budget:
+        raise PromptTooLarge(f"Input is about {tokens:,} tokens; the {feature} limit is {budget:,}. "
+                             "Shorten the text and try again.")
+    return tokens
+
+
+def output_tokens(feature, text="", length=None, output_limit=None, items=1):
+    # `items`: rows in a sentiment batch, or target languages in a multi-target translation
+    if feature == "generation":
+        tokens = OUTPUT_BUDGETS[length]
+    elif feature == "sentiment_batch":
+        tokens = OUTPUT_BUDGETS["sentiment"] + items * OUTPUT_BUDGETS["sentiment_batch"]
+    elif feature == "translation":
+        tokens = items * max(OUTPUT_BUDGETS["translation"], 3 * estimate_tokens(text))
+    else:
+        tokens = OUTPUT_BUDGETS[feature]
+    return min(tokens, output_limit) if output_limit else tokens
+
+
+# ---------------------------
+# Savings over the original templates
+# ---------------------------
+def legacy_generation_prompt(prompt, tone, length):
+    return f"""
+    You are a helpful AI assistant. Generate text with the following requirements:
+    - Tone: {tone}
+    - Length: {length}
+    - Prompt: {prompt}
+
+    Provide a well-structured, engaging response.
+    """
+
+
+def legacy_translation_prompt(text, source_lang, target_lang):
+    return f"""
+    Translate the following text from {source_lang} to {target_lang}:
+
+    Text: "{text}"
+
+    Provide only the translation, no additional text.
+    """
+
+
+def legacy_sentiment_prompt(text):
+    return f"""
+    Analyze the sentiment of this text and classify it as:
+    - POSITIVE if it expresses happiness, satisfaction, or approval
+    - NEGATIVE if it expresses anger, disappointment, or disapproval
+    - NEUTRAL if it's factual without strong emotion
+
+    Text: "{text}"
+
+    Respond with exactly one word: POSITIVE, NEGATIVE, or NEUTRAL
+    """
+
+
+def record_savings(feature, prompt, legacy_prompt):
+    # Counts the estimated input tokens the compact template saved on this call
+    saved = estimate_tokens(legacy_prompt) - estimate_tokens(prompt)
+    if saved > 0:
+        telemetry.registry.inc("genai_prompt_tokens_saved_total", saved, feature=feature)
+    return saved
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from backends import create_backend
+    from generation import generation_prompt
+    from sentiment import single_prompt
+    from translation import translation_prompt
+
+    parser = argparse.ArgumentParser(description="Compare compact prompt templates with the original ones")
+    parser.add_argument("--count", action="store_true", help="count tokens with the API instead of estimating")
+    parser.add_argument("--backend", default=os.getenv("GENAI_BACKEND", "gemini"), choices=["gemini", "fake"])
+    parser.add_argument("--model", default="models/gemini-2.5-flash")
+    args = parser.parse_args()
+
+    client = None
+    if args.count:
+        load_dotenv()
+        backend = create_backend(args.backend, api_key=os.getenv("GEMINI_API_KEY")) if args.backend == "gemini" \
+            else create_backend(args.backend)
+        client = backend.client
+
+    def count(text):
+        if client is None:
+            return estimate_tokens(text)
+        return client.models.count_tokens(model=args.model, contents=text).total_tokens
+
+    pairs = [
+        ("sentiment", single_prompt, legacy_sentiment_prompt, ("The package arrived late, but support was great.",)),
+        ("translation", translation_prompt, legacy_translation_prompt, ("Hello, how are you?", "English", "Telugu")),
+        ("generation", generation_prompt, legacy_generation_prompt,
+         ("Write a short product update for a note-taking app", "Professional", "Short")),
+    ]
+    print(f"{'feature':<14}{'original':>10}{'compact':>10}{'saved':>8}")
+    for feature, compact, legacy, sample in pairs:
+        before, after = count(legacy(*sample)), count(compact(*sample))
+        print(f"{feature:<14}{before:>10}{after:>10}{before - after:>8}")
+
+
+if __name__ == "__main__":
+    main()
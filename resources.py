@@ -0,0 +1,132 @@
+# resources.py
+import os
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+from dotenv import load_dotenv
+
+import telemetry
+from backends import BACKEND, create_backend
+from jobs import JobQueue
+from prefetch import Prefetcher
+from prompt_budget import INPUT_BUDGETS, estimate_tokens
+from service import GenAIService
+
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+
+MAX_TIMINGS = 50
+METRICS_PORT = int(os.getenv("GENAI_METRICS_PORT", "0"))     # 0 disables the /metrics endpoint
+
+
+# ---------------------------
+# Process-wide resources (built once, shared across reruns and sessions)
+# ---------------------------
+@st.cache_resource(show_spinner=False)
+def get_api_key():
+    load_dotenv()
+    return os.getenv("GEMINI_API_KEY")
+
+
+@st.cache_resource(show_spinner=False)
+def get_backend(api_key, name=BACKEND):
+    # One backend per process, so the client's pooled keep-alive connections are reused across reruns
+    return create_backend(name, api_key=api_key) if name == "gemini" else create_backend(name)
+
+
+def get_client(api_key):
+    return get_backend(api_key).client
+
+
+@st.cache_resource(show_spinner=False)
+def get_service(api_key):
+    return GenAIService(get_backend(api_key))
+
+
+@st.cache_resource(show_spinner=False)
+def get_jobs(api_key):
+    # Long voice jobs run here, outside any session's script thread, and survive reruns and closed tabs
+    return JobQueue(get_service(api_key))
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetcher(api_key):
+    # Background TTS for fresh translations and idle-time warming of the example phrases, shared by all sessions
+    return Prefetcher(get_service(api_key))
+
+
+@st.cache_resource(show_spinner=False)
+def start_metrics(port=METRICS_PORT):
+    # Streamlit has no route for Prometheus to scrape, so the process serves /metrics on a side port
+    return telemetry.start_metrics_server(port) if port else None
+
+
+@st.cache_resource(show_spinner=False)
+def load_css():
+    with open(CSS_PATH, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+
+# ---------------------------
+# Rerun timing
+# ---------------------------
+class RerunTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return time.perf_counter() - self.start
+
+    def record(self):
+        timings = st.session_state.setdefault("rerun_timings", [])
+        timings.append({"setup_ms": sum(self.stages.values()) * 1000,
+                        **{f"{k}_ms": v * 1000 for k, v in self.stages.items()}})
+        del timings[:-MAX_TIMINGS]
+        return timings
+
+
+def render_rerun_report(timer):
+    timings = timer.record()
+    first, last = timings[0], timings[-1]
+    with st.expander("⏱️ Rerun overhead"):
+        col1, col2 = st.columns(2)
+        col1.metric("First run", f"{first['setup_ms']:.1f} ms")
+        col2.metric("This rerun", f"{last['setup_ms']:.1f} ms")
+        st.dataframe(timings[-10:], use_container_width=True)
+
+
+# ---------------------------
+# Per-session telemetry
+# ---------------------------
+def session_telemetry():
+    # Everything recorded on this rerun's thread (and pools it fans out to) is added to the session totals
+    stats = st.session_state.setdefault("telemetry", telemetry.SessionStats())
+    telemetry.bind_session(stats)
+    return stats
+
+
+def render_telemetry(stats):
+    with st.expander("📈 Usage & cost"):
+        col1, col2 = st.columns(2)
+        col1.metric("Model calls", stats.calls, help=f"{stats.cached} served from cache")
+        col2.metric("Est. cost", f"${stats.cost:.4f}")
+        st.caption(f"Tokens: {stats.prompt_tokens:,} in · {stats.output_tokens:,} out")
+        rows = stats.stage_rows()
+        if rows:
+            st.dataframe(rows, use_container_width=True)
+
+
+def render_token_count(text, feature):
+    # Local estimate under each input, so oversized pastes are visible before anything is sent
+    if text:
+        tokens, budget = estimate_tokens(text), INPUT_BUDGETS[feature]
+        st.caption(f"{'⚠️ ' if tokens > budget else ''}~{tokens:,} / {budget:,} tokens")
@@ -0,0 +1,169 @@
+# response_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.getenv("GENAI_CACHE_DIR", ".cache")
+CACHE_TTL = int(os.getenv("GENAI_CACHE_TTL", str(7 * 24 * 3600)))      # seconds
+MEMORY_ITEMS = int(os.getenv("GENAI_CACHE_MEMORY_ITEMS", "512"))
+DISK_BYTES = int(os.getenv("GENAI_CACHE_DISK_BYTES", str(100 * 1024 * 1024)))
+EVICT_EVERY = int(os.getenv("GENAI_CACHE_EVICT_EVERY", "100"))         # writes between disk eviction passes
+
+
+# ---------------------------
+# Cache keys
+# ---------------------------
+def _config_dict(config):
+    if config is None:
+        return None
+    if hasattr(config, "model_dump"):
+        return config.model_dump(exclude_none=True, mode="json")
+    return config
+
+
+def make_key(model, prompt, config=None):
+    # The exact prompt: whitespace is meaningful in user text (line breaks, code, poems)
+    payload = json.dumps(
+        {"model": model, "prompt": prompt, "config": _config_dict(config)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------------------
+# Two-tier cache: in-process LRU in front of SQLite
+# ---------------------------
+class ResponseCache:
+    def __init__(self, path=None, ttl=CACHE_TTL, memory_items=MEMORY_ITEMS, disk_bytes=DISK_BYTES,
+                 evict_every=EVICT_EVERY):
+        self.path = path or os.path.join(CACHE_DIR, "responses.sqlite3")
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self.evict_every = evict_every
+        self._writes_since_evict = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                value, created = row
+                if now - created <= self.ttl:
+                    self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, value, created)
+                    self.counters["disk_hits"] += 1
+                    return value
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, value, now)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self.counters["writes"] += 1
+            # Eviction scans the table, so it runs every `evict_every` writes rather than on each one
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= self.evict_every:
+                self._writes_since_evict = 0
+                self._evict_disk(now)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            stats = dict(self.counters)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats.update(
+            memory_items=len(self._memory),
+            disk_items=count,
+            disk_bytes=size,
+            hit_rate=hits / lookups if lookups else 0.0,
+        )
+        return stats
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        # Expired rows go first, then least recently used rows until under the size cap
+        cur = self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self.counters["evictions"] += cur.rowcount
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.disk_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= self.disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._memory.pop(key, None)
+            total -= size
+            self.counters["evictions"] += 1
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
+
+
+def set_default_cache(cache):
+    # Swaps the process-wide instance, e.g. for benchmarks and offline runs
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
@@ -0,0 +1,240 @@
+# sentiment.py
+import csv
+import io
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from llm import DEFAULT_MODEL, generate_text
+from prompt_budget import OUTPUT_BUDGETS, legacy_sentiment_prompt, output_tokens, record_savings
+
+MODEL = DEFAULT_MODEL
+LABELS = ("POSITIVE", "NEGATIVE", "NEUTRAL")
+
+# Texts per packed prompt and parallel chunks in flight
+CHUNK_SIZE = 25
+MAX_WORKERS = 4
+MAX_RETRIES = 2
+
+
+# ---------------------------
+# Response schemas (JSON mode)
+# ---------------------------
+_LABEL = {"type": "STRING", "enum": list(LABELS)}
+_SCORE = {"type": "NUMBER", "minimum": 0, "maximum": 1}
+_ASPECT = {
+    "type": "OBJECT",
+    "properties": {"aspect": {"type": "STRING"}, "label": _LABEL, "score": _SCORE},
+    "required": ["aspect", "label", "score"],
+}
+RESULT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {"label": _LABEL, "score": _SCORE, "aspects": {"type": "ARRAY", "items": _ASPECT}},
+    "required": ["label", "score", "aspects"],
+}
+BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"index": {"type": "INTEGER"}, **RESULT_SCHEMA["properties"]},
+        "required": ["index", "label", "score", "aspects"],
+    },
+}
+SINGLE_CONFIG = {"response_mime_type": "application/json", "response_schema": RESULT_SCHEMA,
+                 "max_output_tokens": OUTPUT_BUDGETS["sentiment"]}
+BATCH_CONFIG = {"response_mime_type": "application/json", "response_schema": BATCH_SCHEMA}
+
+
+# ---------------------------
+# Prompts
+# ---------------------------
+def single_prompt(text):
+    return (
+        "Analyze the sentiment of the text below: POSITIVE (happiness, satisfaction, approval), "
+        "NEGATIVE (anger, disappointment, disapproval) or NEUTRAL (factual, no strong emotion). "
+        "Return the overall label, a confidence score between 0 and 1, and a label and score for each aspect "
+        "it comments on (e.g. price, delivery, support); empty aspects if none.\n\n"
+        f"Text: \"{text}\""
+    )
+
+
+def batch_prompt(texts):
+    # Newlines inside a text would break the numbered layout, so flatten them
+    items = "\n".join(f"{i}. {' '.join(t.split())}" for i, t in enumerate(texts, 1))
+    return (
+        "Classify the sentiment of each numbered text below as POSITIVE "
+        "(happiness, satisfaction, approval), NEGATIVE (anger, disappointment, "
+        "disapproval) or NEUTRAL (factual, no strong emotion).\n"
+        f"Return a JSON array with exactly {len(texts)} objects, one per text, each with its "
+        "'index', the overall 'label', a confidence 'score' between 0 and 1 and per-aspect "
+        "'aspects' (empty if none).\n\n"
+        f"{items}"
+    )
+
+
+# ---------------------------
+# Response parsing (strict: anything off-schema counts as malformed)
+# ---------------------------
+def _label_score(item):
+    if not isinstance(item, dict) or item.get("label") not in LABELS:
+        return None
+    score = item.get("score")
+    if isinstance(score, bool) or not isinstance(score, (int, float)) or not math.isfinite(score) \
+            or not 0 <= score <= 1:
+        return None
+    return item["label"], float(score)
+
+
+def _result(item):
+    # {"label", "score", "aspects": [{"aspect", "label", "score"}]} or None
+    label_score = _label_score(item)
+    aspects = item.get("aspects", []) if isinstance(item, dict) else None
+    if label_score is None or not isinstance(aspects, list):
+        return None
+    parsed = []
+    for aspect in aspects:
+        aspect_score = _label_score(aspect)
+        name = aspect.get("aspect") if isinstance(aspect, dict) else None
+        if aspect_score is None or not isinstance(name, str) or not name.strip():
+            return None
+        parsed.append({"aspect": name.strip(), "label": aspect_score[0], "score": aspect_score[1]})
+    return {"label": label_score[0], "score": label_score[1], "aspects": parsed}
+
+
+def _load_json(text):
+    try:
+        return json.loads(text or "")
+    except ValueError:
+        return None
+
+
+def parse_result(text):
+    return _result(_load_json(text))
+
+
+def parse_batch(text, count):
+    results = [None] * count
+    items = _load_json(text)
+    if not isinstance(items, list):
+        return results
+    for item in items:
+        index = item.get("index") if isinstance(item, dict) else None
+        if isinstance(index, bool) or not isinstance(index, int) or not 1 <= index <= count:
+            continue
+        if results[index - 1] is None:
+            results[index - 1] = _result(item)
+    return results
+
+
+# ---------------------------
+# API calls
+# ---------------------------
+def analyze_sentiment(client, text, model=MODEL, local=None):
+    # Returns {"label", "score", "aspects"}, or None if the model never produced a valid result.
+    # `local` (a sentiment_local.LocalSentiment) answers confident texts without a model call.
+    if local is not None:
+        result = local.confident_results([text])[0]
+        if result:
+            return result
+    with telemetry.stage("prompt_build"):
+        prompt = single_prompt(text)
+    record_savings("sentiment", prompt, legacy_sentiment_prompt(text))
+    reply = generate_text(client, prompt, model=model, config=SINGLE_CONFIG,
+                          accept=lambda t: parse_result(t) is not None)
+    return parse_result(reply)
+
+
+def _analyze_chunk(client, texts, model, max_retries):
+    try:
+        with telemetry.stage("prompt_build"):
+            prompt = batch_prompt(texts)
+        config = {**BATCH_CONFIG, "max_output_tokens": output_tokens("sentiment_batch", items=len(texts))}
+        results = parse_batch(generate_text(client, prompt, model=model, config=config,
+                                            accept=lambda t: None not in parse_batch(t, len(texts))),
+                              len(texts))
+    except Exception:
+        results = [None] * len(texts)
+
+    # Retry only the items that came back missing or malformed
+    for i, result in enumerate(results):
+        attempts = 0
+        while result is None and attempts < max_retries:
+            attempts += 1
+            try:
+                result = analyze_sentiment(client, texts[i], model=model)
+            except Exception:
+                result = None
+        results[i] = result
+    return results
+
+
+def analyze_batch(client, texts, model=MODEL, chunk_size=CHUNK_SIZE,
+                  max_workers=MAX_WORKERS, max_retries=MAX_RETRIES, on_progress=None, local=None):
+    texts = [str(t) for t in texts]
+    results = local.confident_results(texts) if local is not None else [None] * len(texts)
+    sources = ["local" if result else "model" for result in results]
+    # Only the texts the local classifier wasn't sure about are packed into prompts
+    pending = [i for i, result in enumerate(results) if result is None]
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    done = len(texts) - len(pending)
+    if on_progress and done:
+        on_progress(done, len(texts))
+    analyze = telemetry.propagate(lambda c: _analyze_chunk(client, [texts[i] for i in c], model, max_retries))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for chunk, chunk_results in zip(chunks, pool.map(analyze, chunks)):
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+            done += len(chunk_results)
+            if on_progress:
+                on_progress(done, len(texts))
+    return [
+        {
+            "index": i,
+            "text": t,
+            "sentiment": result["label"] if result else "ERROR",
+            "score": result["score"] if result else None,
+            "aspects": result["aspects"] if result else [],
+            "source": source,
+        }
+        for i, (t, result, source) in enumerate(zip(texts, results, sources))
+    ]
+
+
+# ---------------------------
+# File input / output
+# ---------------------------
+def load_texts(data, filename, column="text"):
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    texts = []
+    if filename.lower().endswith((".jsonl", ".ndjson")):
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            value = row.get(column) if isinstance(row, dict) else row
+            if value is not None and str(value).strip():
+                texts.append(str(value))
+    else:
+        reader = csv.DictReader(io.StringIO(data))
+        if reader.fieldnames and column not in reader.fieldnames:
+            raise ValueError(f"Column '{column}' not found. Available: {', '.join(reader.fieldnames)}")
+        for row in reader:
+            value = row.get(column)
+            if value is not None and value.strip():
+                texts.append(value)
+    return texts
+
+
+def to_csv(results):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=["index", "text", "sentiment", "score", "aspects", "source"])
+    writer.writeheader()
+    # Aspects are nested, so the CSV carries them as a JSON string
+    writer.writerows({**r, "aspects": json.dumps(r["aspects"], ensure_ascii=False)} for r in results)
+    return out.getvalue()
+
+
+def to_jsonl(results):
+    return "\n".join(json.dumps(r, ensure_ascii=False) for r in results) + "\n"
@@ -0,0 +1,297 @@
+# sentiment_local.py
+# Local first-stage sentiment classifier: a linear model over hashed word n-grams, seeded from a
+# small lexicon and optionally calibrated against Gemini's labels. Confident texts are answered
+# locally; the rest go to the model.
+#   python sentiment_local.py calibrate reviews.csv --column text
+#   python sentiment_local.py evaluate reviews.csv --label-column label
+import argparse
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+import telemetry
+
+LABELS = ("POSITIVE", "NEGATIVE", "NEUTRAL")
+POSITIVE, NEGATIVE, NEUTRAL = range(3)
+
+DIM = 2 ** 18
+MODEL_PATH = os.getenv("SENTIMENT_MODEL_PATH", os.path.join(os.getenv("GENAI_CACHE_DIR", ".cache"),
+                                                            "sentiment_model.npz"))
+# Minimum softmax probability to answer without the model; above 1 sends everything to the model.
+# Calibration stores its own threshold with the weights, the env var wins over it. The lexicon seed's
+# probabilities are not calibrated, so without a saved model nothing is answered locally by default.
+DISABLED = 1.01
+THRESHOLD_ENV = os.getenv("SENTIMENT_LOCAL_THRESHOLD")
+THRESHOLD = float(THRESHOLD_ENV) if THRESHOLD_ENV else DISABLED
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+|[.,;:!?]")
+_NEGATORS = {"not", "no", "never", "nothing", "nobody", "none", "neither", "nor", "without", "hardly"}
+_NEGATION_SCOPE = 3
+
+POSITIVE_WORDS = """
+love loved loves lovely like liked enjoy enjoyed enjoying great good excellent amazing awesome fantastic
+wonderful perfect best better happy glad pleased delighted satisfied recommend recommended impressive
+impressed brilliant superb outstanding beautiful nice helpful friendly fast smooth easy reliable thank
+thanks grateful favorite fabulous incredible exceptional pleasant comfortable worth exceeded flawless
+""".split()
+NEGATIVE_WORDS = """
+hate hated hates dislike terrible awful horrible worst worse bad poor disappointing disappointed
+disappointment angry annoyed annoying frustrated frustrating useless broken waste refund rude slow
+unreliable unhappy sad upset disgusting mediocre failed fails failure problem problems issue issues
+complaint scam defective damaged cheap ridiculous unacceptable regret buggy crashed crashes never
+""".split()
+NEUTRAL_WORDS = """
+arrived scheduled located contains consists includes announced released reported meeting monday
+tuesday wednesday thursday friday saturday sunday january february march april may june july august
+september october november december am pm today tomorrow yesterday according update version
+""".split()
+
+
+def _hash(token):
+    # crc32 rather than hash(): Python's string hash is salted per process, saved weights must stay valid
+    return zlib.crc32(token.encode("utf-8")) % DIM
+
+
+def tokenize(text):
+    # Words following a negator get a NOT_ prefix, so "not good" and "good" are different features
+    tokens, scope = [], 0
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in ".,;:!?":
+            scope = 0
+            continue
+        if token in _NEGATORS or token.endswith("n't"):
+            tokens.append(token)
+            scope = _NEGATION_SCOPE
+            continue
+        tokens.append(f"NOT_{token}" if scope else token)
+        scope = max(0, scope - 1)
+    return tokens
+
+
+def features(text):
+    tokens = tokenize(text)
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return np.fromiter((_hash(g) for g in grams), dtype=np.int64, count=len(grams))
+
+
+def lexicon_weights(strength=2.5, neutral_strength=1.0, neutral_bias=0.5):
+    weights = np.zeros((3, DIM), dtype=np.float32)
+    for words, label, value in ((POSITIVE_WORDS, POSITIVE, strength), (NEGATIVE_WORDS, NEGATIVE, strength),
+                                (NEUTRAL_WORDS, NEUTRAL, neutral_strength)):
+        for word in words:
+            weights[label, _hash(word)] += value
+            if label != NEUTRAL:
+                # "not good" leans negative, "not bad" leans positive
+                weights[NEGATIVE if label == POSITIVE else POSITIVE, _hash(f"NOT_{word}")] += value * 0.8
+    bias = np.array([0.0, 0.0, neutral_bias], dtype=np.float32)
+    return weights, bias
+
+
+def _softmax(scores):
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# ---------------------------
+# Classifier
+# ---------------------------
+class LocalSentiment:
+    def __init__(self, weights=None, bias=None, threshold=THRESHOLD):
+        if weights is None:
+            weights, bias = lexicon_weights()
+        self.weights = weights
+        self.bias = bias
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.counters = {"local": 0, "escalated": 0}
+
+    @classmethod
+    def load(cls, path=MODEL_PATH, threshold=None):
+        data = np.load(path)
+        if threshold is None:
+            threshold = THRESHOLD if THRESHOLD_ENV or "threshold" not in data else float(data["threshold"])
+        return cls(data["weights"], data["bias"], threshold=threshold)
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(f, weights=self.weights, bias=self.bias, threshold=self.threshold)
+
+    def _scores(self, feature_lists):
+        if len(feature_lists) == 1:
+            return (self.bias + self.weights[:, feature_lists[0]].sum(axis=1))[None, :].astype(np.float64)
+        lengths = np.array([len(f) for f in feature_lists])
+        scores = np.tile(self.bias, (len(feature_lists), 1)).astype(np.float64)
+        if lengths.sum():
+            rows = np.repeat(np.arange(len(feature_lists)), lengths)
+            np.add.at(scores, rows, self.weights[:, np.concatenate(feature_lists)].T)
+        return scores
+
+    def predict_proba(self, texts):
+        return _softmax(self._scores([features(t) for t in texts]))
+
+    def classify(self, texts):
+        # [(label, confidence), ...]
+        proba = self.predict_proba(texts)
+        return [(LABELS[i], float(p[i])) for i, p in zip(proba.argmax(axis=1), proba)]
+
+    def confident_results(self, texts):
+        # {"label", "score", "aspects"} for each text the local model is sure about, None where it should escalate
+        start = time.perf_counter()
+        results = [
+            {"label": label, "score": confidence, "aspects": []} if confidence >= self.threshold else None
+            for label, confidence in self.classify(texts)
+        ]
+        telemetry.record_stage("local_classify", time.perf_counter() - start)
+        escalated = results.count(None)
+        with self._lock:
+            self.counters["local"] += len(results) - escalated
+            self.counters["escalated"] += escalated
+        telemetry.registry.inc("genai_sentiment_local_total", len(results) - escalated, outcome="answered")
+        telemetry.registry.inc("genai_sentiment_local_total", escalated, outcome="escalated")
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        total = stats["local"] + stats["escalated"]
+        stats.update(threshold=self.threshold, escalation_rate=stats["escalated"] / total if total else 0.0)
+        return stats
+
+    # ---------------------------
+    # Calibration against reference (usually Gemini) labels
+    # ---------------------------
+    def fit(self, texts, labels, epochs=200, learning_rate=1.0, l2=1e-3):
+        # Multinomial logistic regression, regularized towards the current weights so that
+        # lexicon knowledge survives a small calibration set
+        feature_lists = [features(t) for t in texts]
+        targets = np.zeros((len(texts), 3))
+        targets[np.arange(len(texts)), [LABELS.index(label) for label in labels]] = 1.0
+        lengths = np.array([len(f) for f in feature_lists])
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        columns = np.concatenate(feature_lists) if lengths.sum() else np.zeros(0, dtype=np.int64)
+        prior = self.weights.astype(np.float64)
+        weights, bias = prior.copy(), self.bias.astype(np.float64)
+        for _ in range(epochs):
+            scores = np.tile(bias, (len(texts), 1))
+            np.add.at(scores, rows, weights[:, columns].T)
+            grad = (_softmax(scores) - targets) / len(texts)
+            grad_weights = np.zeros((DIM, 3))
+            np.add.at(grad_weights, columns, grad[rows])
+            weights -= learning_rate * (grad_weights.T + l2 * (weights - prior))
+            bias -= learning_rate * grad.sum(axis=0)
+        self.weights, self.bias = weights.astype(np.float32), bias.astype(np.float32)
+        return self
+
+    def threshold_report(self, texts, labels, thresholds=(0.5, 0.6, 0.7, 0.8, 0.9, 0.95)):
+        # For each threshold: share of texts escalated and local accuracy on the rest
+        predictions = self.classify(texts)
+        report = []
+        for threshold in thresholds:
+            kept = [(p, t) for (p, c), t in zip(predictions, labels) if c >= threshold]
+            report.append({
+                "threshold": threshold,
+                "escalation_rate": 1 - len(kept) / len(texts) if texts else 0.0,
+                "local_accuracy": sum(p == t for p, t in kept) / len(kept) if kept else float("nan"),
+            })
+        return report
+
+    def choose_threshold(self, texts, labels, target_accuracy=0.95):
+        # Lowest threshold (fewest escalations) whose local answers still meet the target accuracy
+        thresholds = [t / 100 for t in range(50, 100)]
+        for row in self.threshold_report(texts, labels, thresholds):
+            if row["local_accuracy"] >= target_accuracy:
+                self.threshold = row["threshold"]
+                return self.threshold
+        self.threshold = DISABLED
+        return self.threshold
+
+
+_default_classifier = None
+_default_lock = threading.Lock()
+
+
+def get_classifier():
+    global _default_classifier
+    with _default_lock:
+        if _default_classifier is None:
+            _default_classifier = LocalSentiment.load() if os.path.exists(MODEL_PATH) else LocalSentiment()
+        return _default_classifier
+
+
+def set_classifier(classifier):
+    global _default_classifier
+    with _default_lock:
+        _default_classifier = classifier
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _read_labelled(path, column, label_column):
+    import sentiment
+
+    with open(path, "rb") as f:
+        data = f.read()
+    texts = sentiment.load_texts(data, path, column=column)
+    if not label_column:
+        return texts, None
+    labels = sentiment.load_texts(data, path, column=label_column)
+    if len(labels) != len(texts):
+        raise SystemExit(f"'{label_column}' must be filled in for every row")
+    return texts, [label.strip().upper() for label in labels]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate or evaluate the local sentiment classifier")
+    parser.add_argument("command", choices=["calibrate", "evaluate"])
+    parser.add_argument("file", help="CSV or JSONL file of texts")
+    parser.add_argument("--column", default="text")
+    parser.add_argument("--label-column", help="use these labels instead of asking Gemini")
+    parser.add_argument("--backend", default=os.getenv("GENAI_BACKEND", "gemini"), choices=["gemini", "fake"])
+    parser.add_argument("--target-accuracy", type=float, default=0.95)
+    parser.add_argument("--output", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    texts, labels = _read_labelled(args.file, args.column, args.label_column)
+    if labels is None:
+        from dotenv import load_dotenv
+
+        from backends import create_backend
+        from sentiment import analyze_batch
+
+        load_dotenv()
+        backend = create_backend(args.backend, api_key=os.getenv("GEMINI_API_KEY")) if args.backend == "gemini" \
+            else create_backend(args.backend)
+        rows = analyze_batch(backend.client, texts)
+        pairs = [(r["text"], r["sentiment"]) for r in rows if r["sentiment"] in LABELS]
+        texts, labels = [t for t, _ in pairs], [label for _, label in pairs]
+        print(f"Labelled {len(texts)} texts with Gemini")
+
+    classifier = LocalSentiment.load(args.output) if os.path.exists(args.output) else LocalSentiment()
+    if args.command == "calibrate":
+        # Every fifth text is held out so the threshold isn't picked on the training data
+        held_out = len(texts) >= 20
+        train = [(t, label) for i, (t, label) in enumerate(zip(texts, labels)) if not held_out or i % 5]
+        classifier.fit([t for t, _ in train], [label for _, label in train])
+        if held_out:
+            texts, labels = texts[::5], labels[::5]
+            print(f"Fitted on {len(train)} texts, evaluating on {len(texts)} held-out texts")
+
+    print(f"{'threshold':>10}{'escalated':>11}{'local acc':>11}")
+    for row in classifier.threshold_report(texts, labels):
+        print(f"{row['threshold']:>10.2f}{row['escalation_rate']:>11.1%}{row['local_accuracy']:>11.1%}")
+    threshold = classifier.choose_threshold(texts, labels, args.target_accuracy)
+    print(f"Threshold for {args.target_accuracy:.0%} local accuracy: {threshold:g}")
+    if args.command == "calibrate":
+        classifier.save(args.output)
+        print(f"Saved calibrated weights and threshold to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+# service.py
+# The three tools as plain Python calls, shared by the Streamlit UI (app.py) and the HTTP API (api.py).
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import sentiment as sentiment_api
+import telemetry
+from chat import ChatSessions, ContextCaches
+from generation import LENGTHS, TONES, generation_prompt
+from languages import LANGUAGES
+from llm import generate_text, stream_text
+from model_registry import CACHE_DIR, ModelRegistry, ModelRouter
+from prompt_budget import PromptTooLarge, check_input, legacy_generation_prompt, output_tokens, record_savings
+from sentiment_local import get_classifier
+from translation import translate_document, translate_multi, translate_text
+from translation_memory import default_memory
+
+MAX_BATCH = 1000
+MAX_WORKERS = 8
+
+
+def _require_text(value, field):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"'{field}' must be a non-empty string")
+    return value
+
+
+def _require_language(name, field, allow_auto=False):
+    if name not in LANGUAGES or (name == "Auto Detect" and not allow_auto):
+        raise ValueError(f"Unknown {field} '{name}'")
+    return name
+
+
+def _detected(source_lang, resolved):
+    return resolved if source_lang == "Auto Detect" and resolved != source_lang else None
+
+
+def _require_choice(value, choices, field):
+    if value not in choices:
+        raise ValueError(f"'{field}' must be one of: {', '.join(choices)}")
+    return value
+
+
+def _require_batch(items, field):
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"'{field}' must be a non-empty list")
+    if len(items) > MAX_BATCH:
+        raise ValueError(f"'{field}' holds at most {MAX_BATCH} items")
+    return items
+
+
+class GenAIService:
+    def __init__(self, backend, max_workers=MAX_WORKERS, router=None, memory=None):
+        self.backend = backend
+        self.client = backend.client
+        self.max_workers = max_workers
+        self.memory = memory or default_memory()
+        self.chats = ChatSessions()
+        self.context_caches = ContextCaches(self.client)
+        # Each feature picks its model per request; the model list is cached per backend
+        self.router = router or ModelRouter(
+            ModelRegistry(self.client, path=os.path.join(CACHE_DIR, f"models-{backend.name}.json"))
+        )
+
+    def _map(self, fn, items):
+        # Per-item errors are reported in place so one bad item doesn't fail the batch
+        def safe(item):
+            try:
+                return fn(item)
+            except ValueError as e:
+                return {"error": str(e)}
+            except Exception as e:
+                return {"error": f"{type(e).__name__}: {e}"}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(telemetry.propagate(safe), items))
+
+    # ---------------------------
+    # Sentiment
+    # ---------------------------
+    def sentiment(self, text):
+        _require_text(text, "text")
+        check_input("sentiment", text)
+        with telemetry.scope("sentiment"):
+            result = sentiment_api.analyze_sentiment(self.client, text, model=self.router.route("sentiment", text),
+                                                     local=get_classifier())
+        if result is None:
+            raise RuntimeError("The model did not return a valid sentiment result")
+        return {"text": text, "sentiment": result["label"], "score": result["score"], "aspects": result["aspects"]}
+
+    def check_sentiment_texts(self, texts):
+        # Budget check for every text of a batch, before any of it is sent
+        for i, text in enumerate(texts):
+            try:
+                check_input("sentiment", str(text))
+            except PromptTooLarge as e:
+                raise PromptTooLarge(f"Text {i + 1}: {e}")
+
+    def sentiment_batch(self, texts, on_progress=None):
+        _require_batch(texts, "texts")
+        self.check_sentiment_texts(texts)
+        with telemetry.scope("sentiment"):
+            # Chunks pack many short texts into one prompt, which is still a small classification job
+            model = self.router.route("sentiment")
+            return sentiment_api.analyze_batch(self.client, texts, model=model, on_progress=on_progress,
+                                               local=get_classifier())
+
+    # ---------------------------
+    # Text generation
+    # ---------------------------
+    def _generation_request(self, prompt, tone, length):
+        # (prompt, model, config), with the input checked against its budget before anything is sent
+        _require_text(prompt, "prompt")
+        _require_choice(tone, TONES, "tone")
+        _require_choice(length, LENGTHS, "length")
+        model = self.router.route("generation", prompt, length=length)
+        input_limit, output_limit = self.router.registry.limits(model)
+        check_input("generation", prompt, input_limit)
+        with telemetry.stage("prompt_build"):
+            full_prompt = generation_prompt(prompt, tone, length)
+        record_savings("generation", full_prompt, legacy_generation_prompt(prompt, tone, length))
+        config = {"max_output_tokens": output_tokens("generation", length=length, output_limit=output_limit)}
+        return full_prompt, model, config
+
+    def generate(self, prompt, tone="Professional", length="Medium", metrics=None):
+        metrics = {} if metrics is None else metrics
+        with telemetry.scope("generation"):
+            full_prompt, model, config = self._generation_request(prompt, tone, length)
+            start = time.perf_counter()
+            text = generate_text(self.client, full_prompt, model=model, config=config, metrics=metrics)
+        metrics["total"] = metrics["ttft"] = time.perf_counter() - start
+        return {"text": text}
+
+    def generate_stream(self, prompt, tone="Professional", length="Medium", metrics=None):
+        # Validation runs now; the stream itself is tagged wherever it ends up being consumed
+        with telemetry.scope("generation"):
+            full_prompt, model, config = self._generation_request(prompt, tone, length)
+        return telemetry.scoped_iter(
+            "generation", lambda: stream_text(self.client, full_prompt, model=model, config=config, metrics=metrics)
+        )
+
+    def generate_batch(self, items):
+        _require_batch(items, "items")
+        return self._map(
+            lambda item: self.generate(item.get("prompt"), item.get("tone", "Professional"), item.get("length", "Medium")),
+            items,
+        )
+
+    # ---------------------------
+    # Chat
+    # ---------------------------
+    def _chat_session(self, message, session_id, tone, length, context):
+        # (session, model, output_limit); `context` None keeps the session's reference material
+        _require_text(message, "message")
+        _require_choice(tone, TONES, "tone")
+        _require_choice(length, LENGTHS, "length")
+        if context is not None and not isinstance(context, str):
+            raise ValueError("'context' must be a string")
+        check_input("chat_context", context or "")
+        model = self.router.route("generation", message, length=length)
+        input_limit, output_limit = self.router.registry.limits(model)
+        check_input("generation", message, input_limit)
+        return self.chats.get(session_id), model, output_limit
+
+    def _chat_request(self, session, message, tone, length, context, model, output_limit):
+        # (contents, config). Runs with session.lock held: compaction rewrites the history.
+        session.tone, session.length = tone, length
+        if context is not None:
+            session.context = context
+        with telemetry.stage("chat_compaction"):
+            session.compact(self._summarize)
+        # The stable preamble is read from a server-side cache when it is big enough to qualify; otherwise
+        # it goes inline as system_instruction, where it is still a repeated prefix for implicit caching
+        preamble = session.preamble()
+        cache = self.context_caches.get(model, preamble)
+        with telemetry.stage("prompt_build"):
+            contents = session.contents(message)
+            config = {"max_output_tokens": output_tokens("generation", length=length, output_limit=output_limit)}
+            if cache:
+                config["cached_content"] = cache
+            else:
+                config["system_instruction"] = preamble
+        return contents, config
+
+    def _summarize(self, prompt):
+        model = self.router.resolve(self.router.routes["chat_summary"])
+        config = {"max_output_tokens": output_tokens("chat_summary")}
+        return generate_text(self.client, prompt, model=model, config=config)
+
+    def chat(self, message, session_id=None, tone="Professional", length="Medium", context=None, metrics=None):
+        # One turn of a conversation; a None or unknown session_id starts a new one
+        metrics = {} if metrics is None else metrics
+        with telemetry.scope("generation"):
+            session, model, output_limit = self._chat_session(message, session_id, tone, length, context)
+            with session.lock:
+                contents, config = self._chat_request(session, message, tone, length, context, model, output_limit)
+                start = time.perf_counter()
+                text = generate_text(self.client, contents, model=model, config=config, metrics=metrics)
+                metrics["total"] = metrics["ttft"] = time.perf_counter() - start
+                session.add_exchange(message, text)
+                return {"text": text, **session.info()}
+
+    def chat_stream(self, message, session_id=None, tone="Professional", length="Medium", context=None, metrics=None):
+        # (session_id, chunk iterator); the exchange joins the history once the stream completes
+        with telemetry.scope("generation"):
+            session, model, output_limit = self._chat_session(message, session_id, tone, length, context)
+
+        def chunks():
+            with session.lock:
+                contents, config = self._chat_request(session, message, tone, length, context, model, output_limit)
+                parts = []
+                for chunk in stream_text(self.client, contents, model=model, config=config, metrics=metrics):
+                    parts.append(chunk)
+                    yield chunk
+                session.add_exchange(message, "".join(parts))
+
+        return session.id, telemetry.scoped_iter("generation", chunks)
+
+    def chat_reset(self, session_id):
+        return self.chats.reset(session_id)
+
+    # ---------------------------
+    # Translation
+    # ---------------------------
+    def translate(self, text, source_lang="Auto Detect", target_lang="English"):
+        _require_text(text, "text")
+        _require_language(source_lang, "source_lang", allow_auto=True)
+        _require_language(target_lang, "target_lang")
+        check_input("translation", text)
+        with telemetry.scope("translation"):
+            translation, match, resolved = self._translate(text, source_lang, target_lang,
+                                                           self.router.route("translation", text))
+        return {
+            "text": text,
+            "source_lang": source_lang,
+            # The language identified locally when source_lang is "Auto Detect" (None if unsure)
+            "detected_lang": _detected(source_lang, resolved),
+            "target_lang": target_lang,
+            "translation": translation,
+            # "exact" / "fuzzy" when served from the translation memory; a "hint" is a near match shown alongside
+            "memory": match,
+        }
+
+    def _resolve_source(self, text, source_lang):
+        # "Auto Detect" is resolved locally when the script settles it, so prompts and memory keys carry the
+        # real source language; anything else is left to the model
+        if source_lang != "Auto Detect":
+            return source_lang
+        from language_id import resolve_source
+
+        with telemetry.stage("language_id"):
+            return resolve_source(text, source_lang)
+
+    def _translate(self, text, source_lang, target_lang, model):
+        # (translation, memory match, resolved source language); text already in the target language is returned as is
+        source_lang = self._resolve_source(text, source_lang)
+        if source_lang == target_lang:
+            return text, None, source_lang
+        match = self.memory.lookup(text, source_lang, target_lang)
+        if match and match["kind"] != "hint":
+            return match["target"], match, source_lang
+        translation = translate_text(self.client, text, source_lang, target_lang, model=model,
+                                     output_limit=self.router.registry.limits(model)[1], hint=match)
+        self.memory.add(text, translation, source_lang, target_lang)
+        return translation, match, source_lang
+
+    def translate_batch(self, items):
+        _require_batch(items, "items")
+        return self._map(
+            lambda item: self.translate(item.get("text"), item.get("source_lang", "Auto Detect"),
+                                        item.get("target_lang", "English")),
+            items,
+        )
+
+    def translate_multi(self, text, source_lang="Auto Detect", target_langs=None, on_progress=None):
+        # One source into many targets; speech for each target is left to speech() on demand
+        _require_text(text, "text")
+        _require_language(source_lang, "source_lang", allow_auto=True)
+        _require_batch(target_langs, "target_langs")
+        for lang in target_langs:
+            _require_language(lang, "target_langs")
+        check_input("translation", text)
+        targets = list(dict.fromkeys(target_langs))
+        with telemetry.scope("translation"):
+            resolved = self._resolve_source(text, source_lang)
+            # A target equal to the source needs no translation
+            served = {lang: text for lang in targets if lang == resolved}
+            matches = {lang: self.memory.lookup(text, resolved, lang) for lang in targets if lang not in served}
+            served.update({lang: m["target"] for lang, m in matches.items() if m and m["kind"] != "hint"})
+            missing = [lang for lang in targets if lang not in served]
+            if on_progress and served:
+                on_progress(len(served), len(targets))
+            translated = {}
+            if missing:
+                def progress(done, _):
+                    if on_progress:
+                        on_progress(len(served) + done, len(targets))
+
+                translated = translate_multi(self.client, text, resolved, missing,
+                                             model=self.router.route("translation", text), on_progress=progress)
+                self.memory.add_many(((text, translation, resolved, lang) for lang, translation in translated.items()),
+                                     origin="model")
+        return {
+            "text": text,
+            "source_lang": source_lang,
+            "detected_lang": _detected(source_lang, resolved),
+            "translations": [
+                {"target_lang": lang, "translation": served.get(lang) or translated[lang],
+                 "memory": matches[lang]["kind"] if lang in served and lang in matches else None}
+                for lang in targets
+            ],
+        }
+
+    def translate_document(self, text, source_lang="Auto Detect", target_lang="English", on_progress=None):
+        _require_text(text, "text")
+        _require_language(source_lang, "source_lang", allow_auto=True)
+        _require_language(target_lang, "target_lang")
+        check_input("document", text)
+        with telemetry.scope("translation"):
+            resolved = self._resolve_source(text, source_lang)
+            if resolved == target_lang:
+                result = {"text": text, "segments": 0, "reused": 0, "sent": 0}
+            else:
+                # Documents are translated segment by segment, and each segment is a short prompt
+                result = translate_document(self.client, text, resolved, target_lang,
+                                            model=self.router.route("translation"), on_progress=on_progress,
+                                            memory=self.memory)
+        return {**result, "detected_lang": _detected(source_lang, resolved)}
+
+    def speech(self, text, target_lang, metrics=None):
+        _require_text(text, "text")
+        # The TTS stack loads on first use, not with the service
+        from tts import synthesize
+
+        with telemetry.scope("translation"):
+            return synthesize(text, LANGUAGES.get(target_lang) or "en", metrics=metrics)
+
+    # ---------------------------
+    # Voice translation
+    # ---------------------------
+    def voice_translate(self, data, filename, source_lang="Auto Detect", target_lang="English", meter=None, skip=()):
+        # Generator of per-segment results ({"index", "start", "end", "transcript", "translation", "error"});
+        # segment indices in `skip` are not processed again
+        _require_language(source_lang, "source_lang", allow_auto=True)
+        _require_language(target_lang, "target_lang")
+        if not data:
+            raise ValueError("Audio upload is empty")
+        yield from telemetry.scoped_iter(
+            "voice", lambda: self._voice_segments(data, filename, source_lang, target_lang, meter, skip)
+        )
+
+    def _voice_segments(self, data, filename, source_lang, target_lang, meter, skip):
+        # Audio decoding and ASR (speech_recognition, pydub) load on the first voice request
+        from audio_pipeline import audio_source, transcribe_stream
+
+        model = self.router.route("translation")
+        with audio_source(data, suffix=os.path.splitext(filename or "")[1], meter=meter) as audio_input:
+            yield from transcribe_stream(
+                audio_input,
+                self.backend.recognizer(LANGUAGES.get(source_lang)),
+                # Recognition runs before any text exists, so "Auto Detect" is resolved per transcript here
+                translate=lambda text: self._translate(text, source_lang, target_lang, model)[0],
+                meter=meter,
+                skip=skip,
+            )
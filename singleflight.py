@@ -0,0 +1,84 @@
+# singleflight.py
+# Coalesces concurrent identical requests: the first caller for a key (the leader) makes the call,
+# callers arriving while it is in flight wait for and share its result or exception.
+import threading
+
+from dispatcher import DEFAULT_DEADLINE, DeadlineExceeded
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "suppressed": 0}
+
+    def acquire(self, key):
+        # (flight, is_leader). A leader must call release(); everyone else calls wait()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.counters["leaders"] += 1
+            return flight, True
+
+    def release(self, key, flight, result=None, error=None):
+        flight.result, flight.error = result, error
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.done.set()
+
+    def wait(self, flight, timeout=None):
+        timeout = DEFAULT_DEADLINE if timeout is None else timeout
+        if not flight.done.wait(timeout or None):
+            raise DeadlineExceeded(f"shared call exceeded {timeout:g}s deadline")
+        if flight.error is not None:
+            raise flight.error
+        with self._lock:
+            self.counters["suppressed"] += 1
+        return flight.result
+
+    def do(self, key, fn, timeout=None):
+        # (result, shared): shared is True when the result came from another caller's call
+        flight, leader = self.acquire(key)
+        if not leader:
+            return self.wait(flight, timeout), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self.release(key, flight, error=e)
+            raise
+        self.release(key, flight, result=result)
+        return result, False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._flights))
+
+
+_default_singleflight = None
+_default_lock = threading.Lock()
+
+
+def get_singleflight():
+    global _default_singleflight
+    with _default_lock:
+        if _default_singleflight is None:
+            _default_singleflight = SingleFlight()
+        return _default_singleflight
+
+
+def set_singleflight(singleflight):
+    global _default_singleflight
+    with _default_lock:
+        _default_singleflight = singleflight
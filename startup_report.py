@@ -0,0 +1,117 @@
+# startup_report.py
+# Compares the per-rerun setup cost of the old app.py (rebuilt every rerun)
+# with the cached resources used now, and profiles what a cold process imports.
+#   python startup_report.py [reruns]
+#   python startup_report.py --imports        # -X importtime profile of app.py's imports
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from languages import LANGUAGES
+from percentiles import percentile
+
+
+def uncached_setup():
+    from google import genai
+
+    import resources
+
+    load_dotenv()
+    client = genai.Client(api_key=os.getenv("GEMINI_API_KEY") or "dummy")
+    names = list(LANGUAGES.keys())
+    names.index("Telugu")
+    with open(resources.CSS_PATH, encoding="utf-8") as f:
+        css = f"<style>\n{f.read()}</style>"
+    return client, names, css
+
+
+def cached_setup():
+    import resources
+
+    api_key = resources.get_api_key() or "dummy"
+    return resources.get_client(api_key), resources.load_css()
+
+
+def measure(fn, reruns):
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+# Loaded on first use of the Translator's speech or voice features; a cold start must not import them
+LAZY_MODULES = ("audio_pipeline", "speech_recognition", "pydub", "gtts", "tts", "language_id")
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def app_imports(path=APP_PATH):
+    # Top-level modules app.py imports, in order
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return list(dict.fromkeys(names))
+
+
+def import_profile(modules):
+    # Imports `modules` in a fresh interpreter under -X importtime.
+    # Returns ({module: (self_us, cumulative_us)}, modules that failed to import).
+    # Plain import statements: -X importtime doesn't log the module importlib.import_module() is called with
+    code = "".join(f"try:\n    import {name}\nexcept ImportError:\n    print({name!r})\n" for name in modules)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                          cwd=os.path.dirname(APP_PATH))
+    timings = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings, proc.stdout.split()
+
+
+def report_imports(top=15):
+    modules = app_imports()
+    timings, missing = import_profile(modules)
+    total = sum(timings[m][1] for m in modules if m in timings)
+    print(f"app.py imports {len(modules)} modules: {total / 1000:.1f} ms cumulative")
+    if missing:
+        print(f"not installed (skipped): {', '.join(missing)}")
+    print(f"\n{'module':<44}{'self ms':>9}{'cumul ms':>10}")
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda kv: -kv[1][1])[:top]:
+        print(f"{name:<44}{self_us / 1000:>9.1f}{cumulative_us / 1000:>10.1f}")
+    eager = [m for m in LAZY_MODULES if m in timings]
+    print(f"\nLazy modules imported at startup: {', '.join(eager) or 'none'}")
+    return not eager
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerun setup benchmark and import-time profile")
+    parser.add_argument("reruns", nargs="?", type=int, default=50)
+    parser.add_argument("--imports", action="store_true", help="profile app.py's imports in a fresh interpreter")
+    args = parser.parse_args()
+    if args.imports:
+        # Non-zero exit when a lazily loaded module creeps back into the startup path
+        sys.exit(0 if report_imports() else 1)
+
+    reruns = args.reruns
+    print(f"{'setup':<10}{'first ms':>10}{'median ms':>11}{'p95 ms':>9}")
+    for name, fn in (("before", uncached_setup), ("after", cached_setup)):
+        samples = measure(fn, reruns)
+        p95 = percentile(samples, 95)
+        print(f"{name:<10}{samples[0]:>10.2f}{statistics.median(samples[1:] or samples):>11.3f}{p95:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+# telemetry.py
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# USD per 1M tokens (input, output); override with GENAI_PRICES='{"models/x": [0.1, 0.4]}'
+PRICES = {
+    "models/gemini-2.5-flash-lite": (0.10, 0.40),
+    "models/gemini-2.5-flash": (0.30, 2.50),
+    "models/gemini-2.5-pro": (1.25, 10.00),
+}
+PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("GENAI_PRICES", "{}")).items()})
+# Prompt tokens read from a context cache bill at this fraction of the input price
+CACHED_INPUT_FACTOR = 0.25
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+STAGES = ("local_classify", "language_id", "prompt_build", "chat_compaction", "network", "audio_decode", "vad", "asr",
+          "tts")
+
+_feature = contextvars.ContextVar("genai_feature", default="other")
+_session = contextvars.ContextVar("genai_session", default=None)
+
+
+def cost(model, prompt_tokens, output_tokens, cached_tokens=0):
+    # prompt_tokens includes the cached_tokens served from a context cache
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    fresh = prompt_tokens - cached_tokens
+    return (fresh * price_in + cached_tokens * price_in * CACHED_INPUT_FACTOR + output_tokens * price_out) / 1_000_000
+
+
+# ---------------------------
+# Process-wide registry, exported in Prometheus text format
+# ---------------------------
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> [bucket counts..., sum, count]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self.histograms.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def render(self):
+        def fmt(labels, extra=()):
+            items = list(labels) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}" if items else ""
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+        lines, seen = [], set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{fmt(labels)} {value}")
+        for (name, labels), hist in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            for bound, count in zip(BUCKETS, hist):
+                lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {hist[-1]}")
+            lines.append(f"{name}_sum{fmt(labels)} {hist[-2]}")
+            lines.append(f"{name}_count{fmt(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# ---------------------------
+# Per-session totals (one per Streamlit session)
+# ---------------------------
+class SessionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.stages = {}        # (feature, stage) -> [seconds, count]
+
+    def add_call(self, cached, prompt_tokens, output_tokens, call_cost):
+        with self._lock:
+            self.calls += 1
+            self.cached += cached
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            self.cost += call_cost
+
+    def add_stage(self, feature, stage, seconds):
+        with self._lock:
+            entry = self.stages.setdefault((feature, stage), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def stage_rows(self):
+        with self._lock:
+            return [
+                {"feature": feature, "stage": stage, "total_s": round(total, 3), "count": count,
+                 "avg_ms": round(total / count * 1000, 1)}
+                for (feature, stage), (total, count) in sorted(self.stages.items(), key=lambda kv: -kv[1][0])
+            ]
+
+
+# ---------------------------
+# Recording API
+# ---------------------------
+@contextmanager
+def scope(feature, session=None):
+    # Tags everything recorded inside with `feature` (and routes it to `session` if given)
+    tokens = [_feature.set(feature)]
+    if session is not None:
+        tokens.append(_session.set(session))
+    try:
+        yield
+    finally:
+        for token in reversed(tokens):
+            token.var.reset(token)
+
+
+def bind_session(session):
+    _session.set(session)
+
+
+def current_feature():
+    return _feature.get()
+
+
+def scoped_iter(feature, factory):
+    # Runs a generator in its own context tagged with `feature`, whichever thread pulls from it
+    ctx = contextvars.copy_context()
+    ctx.run(_feature.set, feature)
+    iterator = ctx.run(factory)
+    while True:
+        try:
+            item = ctx.run(next, iterator)
+        except StopIteration:
+            return
+        yield item
+
+
+def propagate(fn):
+    # Thread pools don't inherit context variables; this carries feature/session into workers
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+def record_stage(stage, seconds, feature=None):
+    feature = feature or _feature.get()
+    registry.observe("genai_stage_seconds", seconds, feature=feature, stage=stage)
+    session = _session.get()
+    if session is not None:
+        session.add_stage(feature, stage, seconds)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_call(model, usage=None, cached=False):
+    feature = _feature.get()
+    prompt_tokens = (getattr(usage, "prompt_token_count", None) or 0) if usage else 0
+    output_tokens = (getattr(usage, "candidates_token_count", None) or 0) if usage else 0
+    cached_tokens = (getattr(usage, "cached_content_token_count", None) or 0) if usage else 0
+    # Thinking models bill their thoughts as output tokens, but report them outside candidates_token_count
+    thought_tokens = (getattr(usage, "thoughts_token_count", None) or 0) if usage else 0
+    output_tokens += thought_tokens
+    call_cost = 0.0 if cached else cost(model, prompt_tokens, output_tokens, cached_tokens)
+    registry.inc("genai_requests_total", feature=feature, model=model, cached=str(bool(cached)).lower())
+    if not cached:
+        registry.inc("genai_prompt_tokens_total", prompt_tokens, feature=feature, model=model)
+        registry.inc("genai_output_tokens_total", output_tokens, feature=feature, model=model)
+        if thought_tokens:
+            registry.inc("genai_thought_tokens_total", thought_tokens, feature=feature, model=model)
+        if cached_tokens:
+            registry.inc("genai_cached_prompt_tokens_total", cached_tokens, feature=feature, model=model)
+        registry.inc("genai_cost_usd_total", call_cost, feature=feature, model=model)
+    session = _session.get()
+    if session is not None:
+        session.add_call(bool(cached), prompt_tokens if not cached else 0, output_tokens if not cached else 0, call_cost)
+
+
+def render_prometheus():
+    return registry.render()
+
+
+# ---------------------------
+# Standalone /metrics endpoint for processes without their own HTTP server (Streamlit)
+# ---------------------------
+def start_metrics_server(port, host="0.0.0.0"):
+    # http.server is only needed when metrics are actually served (GENAI_METRICS_PORT set)
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="genai-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,233 @@
+# translation.py
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+from llm import DEFAULT_MODEL, generate_text
+from prompt_budget import estimate_tokens, legacy_translation_prompt, output_tokens, record_savings
+
+MODEL = DEFAULT_MODEL
+
+# Input tokens per document segment and segments translated in parallel
+SEGMENT_TOKENS = 800
+MAX_WORKERS = 8
+# Target languages packed into one multi-target prompt
+TARGETS_PER_PROMPT = 8
+
+MULTI_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {
+        "type": "ARRAY",
+        "items": {
+            "type": "OBJECT",
+            "properties": {"language": {"type": "STRING"}, "translation": {"type": "STRING"}},
+            "required": ["language", "translation"],
+        },
+    },
+}
+
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n\s*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?।॥])\s+|(?<=[。！？])\s*")
+_WORD_RE = re.compile(r"\s+")
+
+
+# ---------------------------
+# Prompts
+# ---------------------------
+def hint_note(hint):
+    # A near match from the translation memory, offered as reference wording, never as the answer
+    if not hint:
+        return ""
+    return (f"\n\nA similar text was translated before. Reuse its wording where it still fits, but translate "
+            f"every difference (numbers, dates, negations):\nSource: \"{hint['source']}\"\n"
+            f"Translation: \"{hint['target']}\"")
+
+
+def translation_prompt(text, source_lang, target_lang, hint=None):
+    return (f"Translate from {source_lang} to {target_lang}. Reply with the translation only.{hint_note(hint)}"
+            f"\n\nText: \"{text}\"")
+
+
+def segment_prompt(text, source_lang, target_lang, hint=None):
+    return (
+        f"Translate this part of a longer document from {source_lang} to {target_lang}. "
+        "Keep line breaks, Markdown, lists, numbers and URLs exactly as they are. "
+        f"Reply with the translation only.{hint_note(hint)}\n\n"
+        f"{text}"
+    )
+
+
+def multi_target_prompt(text, source_lang, target_langs):
+    return (
+        f"Translate the text below from {source_lang} into each of these languages: {', '.join(target_langs)}.\n"
+        "Return a JSON array with one object per language, each with the 'language' name exactly as listed "
+        "and its 'translation'. Translations only, no notes.\n\n"
+        f"Text: \"{text}\""
+    )
+
+
+def parse_multi(reply, target_langs):
+    # {language: translation} for the requested languages present in the reply; anything else is dropped
+    try:
+        items = json.loads(reply or "")
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+    wanted = set(target_langs)
+    found = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        language, translation = item.get("language"), item.get("translation")
+        if language in wanted and language not in found and isinstance(translation, str) and translation.strip():
+            found[language] = translation.strip()
+    return found
+
+
+# ---------------------------
+# Segmentation
+# ---------------------------
+def _split_keep(text, pattern):
+    # [(piece, separator_after), ...] such that joining everything gives back `text`
+    pieces, pos = [], 0
+    for m in pattern.finditer(text):
+        if m.end() == pos or m.start() == 0:
+            continue
+        pieces.append((text[pos:m.start()], m.group()))
+        pos = m.end()
+    if pos < len(text):
+        pieces.append((text[pos:], ""))
+    return pieces
+
+
+def _pack(pieces, max_tokens, fallback=None):
+    # Greedily joins consecutive pieces up to the budget; oversize pieces are split by `fallback`
+    segments, current, current_tokens = [], "", 0
+    for piece, sep in pieces:
+        tokens = estimate_tokens(piece)
+        if tokens > max_tokens and fallback is not None:
+            if current:
+                segments.append((current.rstrip(), current[len(current.rstrip()):]))
+                current, current_tokens = "", 0
+            inner = fallback(piece)
+            inner[-1] = (inner[-1][0], inner[-1][1] + sep)
+            segments.extend(inner)
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            segments.append((current.rstrip(), current[len(current.rstrip()):]))
+            current, current_tokens = "", 0
+        current += piece + sep
+        current_tokens += tokens
+    if current:
+        segments.append((current.rstrip(), current[len(current.rstrip()):]))
+    return segments
+
+
+def split_segments(text, max_tokens=SEGMENT_TOKENS):
+    # Returns (leading_whitespace, [(segment, separator_after), ...]). Every paragraph starts a new
+    # segment so an edit only changes the segments of the paragraphs it touches.
+    body = text.strip()
+    prefix = text[:len(text) - len(text.lstrip())]
+    suffix = text[len(text.rstrip()):] if body else ""
+
+    def split_words(sentence):
+        return _pack(_split_keep(sentence, _WORD_RE), max_tokens)
+
+    def split_sentences(paragraph):
+        return _pack(_split_keep(paragraph, _SENTENCE_RE), max_tokens, fallback=split_words)
+
+    segments = []
+    for paragraph, sep in _split_keep(body, _PARAGRAPH_RE):
+        if estimate_tokens(paragraph) <= max_tokens:
+            segments.append((paragraph, sep))
+        else:
+            inner = split_sentences(paragraph)
+            inner[-1] = (inner[-1][0], inner[-1][1] + sep)
+            segments.extend(inner)
+    if segments:
+        segments[-1] = (segments[-1][0], segments[-1][1] + suffix)
+    return prefix, segments
+
+
+# ---------------------------
+# Translation
+# ---------------------------
+def translate_text(client, text, source_lang, target_lang, model=MODEL, output_limit=None, hint=None):
+    # `hint`: a translation-memory near match ({"source", "target"}) to guide the wording
+    with telemetry.stage("prompt_build"):
+        prompt = translation_prompt(text, source_lang, target_lang, hint)
+    record_savings("translation", prompt, legacy_translation_prompt(text, source_lang, target_lang))
+    config = {"max_output_tokens": output_tokens("translation", text, output_limit=output_limit)}
+    return generate_text(client, prompt, model=model, config=config).strip()
+
+
+def translate_document(client, text, source_lang, target_lang, model=MODEL, max_tokens=SEGMENT_TOKENS,
+                       max_workers=MAX_WORKERS, on_progress=None, memory=None):
+    # `memory` (a translation_memory.TranslationMemory) serves known segments and learns new ones
+    prefix, segments = split_segments(text, max_tokens)
+    reused = 0
+    done = 0
+
+    def translate_segment(segment):
+        match = memory.lookup(segment, source_lang, target_lang) if memory is not None else None
+        if match and match["kind"] != "hint":
+            return match["target"], True
+        metrics = {}
+        with telemetry.stage("prompt_build"):
+            prompt = segment_prompt(segment, source_lang, target_lang, match)
+        # Unchanged segments produce the same prompt and come straight from the response cache
+        config = {"max_output_tokens": output_tokens("translation", segment)}
+        result = generate_text(client, prompt, model=model, config=config, metrics=metrics).strip()
+        if memory is not None:
+            memory.add(segment, result, source_lang, target_lang)
+        return result, metrics.get("cached", False)
+
+    translate_segment = telemetry.propagate(translate_segment)
+    parts = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for (segment, sep), (translated, cached) in zip(segments, pool.map(translate_segment, [s for s, _ in segments])):
+            parts.append(translated + sep)
+            reused += cached
+            done += 1
+            if on_progress:
+                on_progress(done, len(segments))
+
+    return {
+        "text": prefix + "".join(parts),
+        "segments": len(segments),
+        "reused": reused,
+        "sent": len(segments) - reused,
+    }
+
+
+def translate_multi(client, text, source_lang, target_langs, model=MODEL, targets_per_prompt=TARGETS_PER_PROMPT,
+                    max_workers=MAX_WORKERS, on_progress=None):
+    # {target_lang: translation}. Targets are packed several per structured prompt and the prompts run
+    # concurrently; languages missing from a reply are retried with a single-target prompt.
+    target_langs = list(target_langs)
+    groups = [target_langs[i:i + targets_per_prompt] for i in range(0, len(target_langs), targets_per_prompt)]
+
+    def translate_group(group):
+        with telemetry.stage("prompt_build"):
+            prompt = multi_target_prompt(text, source_lang, group)
+        try:
+            config = {**MULTI_CONFIG, "max_output_tokens": output_tokens("translation", text, items=len(group))}
+            found = parse_multi(generate_text(client, prompt, model=model, config=config,
+                                              accept=lambda t: len(parse_multi(t, group)) == len(group)), group)
+        except Exception:
+            found = {}
+        for lang in group:
+            if lang not in found:
+                found[lang] = translate_text(client, text, source_lang, lang, model=model)
+        return found
+
+    results, done = {}, 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for found in pool.map(telemetry.propagate(translate_group), groups):
+            results.update(found)
+            done += len(found)
+            if on_progress:
+                on_progress(done, len(target_langs))
+    return {lang: results[lang] for lang in target_langs}
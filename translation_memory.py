@@ -0,0 +1,319 @@
+# translation_memory.py
+# Persistent translation memory: exact reuse by (source language, target language, normalized segment),
+# fuzzy reuse through a MinHash/LSH index over character trigrams, TMX and JSONL import/export.
+import difflib
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from xml.etree import ElementTree as ET
+
+import numpy as np
+
+from languages import LANGUAGES
+
+CACHE_DIR = os.getenv("GENAI_CACHE_DIR", ".cache")
+# Similarity (0-1) at which a near match is passed to the model as a hint. Near matches are only served
+# outright when TM_SERVE_SIMILARITY is set, and even then never when numbers or negations differ.
+HINT_SIMILARITY = float(os.getenv("TM_HINT_SIMILARITY", "0.7"))
+SERVE_SIMILARITY = float(os.getenv("TM_SERVE_SIMILARITY")) if os.getenv("TM_SERVE_SIMILARITY") else None
+
+# Tokens whose difference flips a sentence's meaning however similar the rest is
+NEGATIONS = {
+    "no", "not", "never", "none", "nothing", "nobody", "neither", "nor", "without", "cannot",
+    "nunca", "nada", "nadie", "ni", "sin", "não", "nao", "nem", "ne", "pas", "jamais", "rien", "non", "nicht",
+    "kein", "keine", "keinen", "nie", "niemals", "ohne", "niet", "geen", "nooit", "nu", "niciodată",
+    "ani", "bez", "nikdy", "không", "tidak", "bukan", "jangan", "hapana", "si", "değil", "yok",
+    "нет", "не", "ни", "никогда", "δεν", "μη", "όχι", "नहीं", "न", "मत", "ना", "కాదు", "లేదు", "இல்லை",
+    "ಇಲ್ಲ", "ഇല്ല", "না", "نہیں", "لا", "لم", "لن", "ليس", "ไม่", "안", "않", "없",
+}
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_TOKEN_RE = re.compile(r"\w+(?:'\w+)?")
+
+# 64 MinHash permutations in 16 LSH bands of 4 rows
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 3
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240601)
+_PERM_A = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _PRIME, NUM_PERM).astype(np.uint64)
+
+_XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+UNDETERMINED = "und"
+
+
+# ---------------------------
+# Normalization and MinHash
+# ---------------------------
+def normalize(text):
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _fold(text):
+    return normalize(text).casefold()
+
+
+def signature(text):
+    folded = _fold(text)
+    shingles = {folded[i:i + SHINGLE] for i in range(max(1, len(folded) - SHINGLE + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    hashes %= _PRIME
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def _bands(sig):
+    rows = NUM_PERM // BANDS
+    return [(band, sig[band * rows:(band + 1) * rows].tobytes()) for band in range(BANDS)]
+
+
+def similarity(a, b):
+    return difflib.SequenceMatcher(None, _fold(a), _fold(b), autojunk=False).ratio()
+
+
+def _anchors(text):
+    # Numbers and negation words, in order: two sources that differ here need different translations
+    folded = _fold(text)
+    negations = [t for t in _TOKEN_RE.findall(folded) if t in NEGATIONS or t.endswith("n't")]
+    return _NUMBER_RE.findall(folded), negations
+
+
+def same_anchors(a, b):
+    return _anchors(a) == _anchors(b)
+
+
+# ---------------------------
+# Language codes (TMX uses BCP 47 codes, the app uses names)
+# ---------------------------
+_CODE_TO_NAME = {code.lower(): name for name, code in LANGUAGES.items() if code}
+
+
+def language_code(name):
+    return LANGUAGES.get(name) or (UNDETERMINED if name == "Auto Detect" else name)
+
+
+def language_name(code):
+    code = (code or "").strip()
+    lowered = code.lower()
+    if lowered == UNDETERMINED:
+        return "Auto Detect"
+    if code in LANGUAGES:
+        return code
+    return _CODE_TO_NAME.get(lowered) or _CODE_TO_NAME.get(lowered.split("-")[0]) or code
+
+
+# ---------------------------
+# Memory
+# ---------------------------
+class TranslationMemory:
+    def __init__(self, path=None, hint_similarity=HINT_SIMILARITY, serve_similarity=SERVE_SIMILARITY):
+        self.path = path or os.path.join(CACHE_DIR, "translation_memory.sqlite3")
+        self.hint_similarity = hint_similarity
+        self.serve_similarity = serve_similarity
+        self._lock = threading.Lock()
+        self._indexes = {}      # (source_lang, target_lang) -> {(band, bytes): {row ids}}
+        self.counters = {"exact": 0, "fuzzy": 0, "hints": 0, "misses": 0, "writes": 0}
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            "id INTEGER PRIMARY KEY, source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, "
+            "key TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, signature BLOB NOT NULL, "
+            "origin TEXT NOT NULL, created REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+            "UNIQUE (source_lang, target_lang, key))"
+        )
+        self._db.commit()
+
+    def lookup(self, text, source_lang, target_lang):
+        # Best match as {"kind": "exact" | "fuzzy" | "hint", "source", "target", "similarity"}, or None.
+        # "exact" and "fuzzy" matches can be served; a "hint" goes to the model as a reference translation.
+        key = normalize(text)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, source, target FROM units WHERE source_lang = ? AND target_lang = ? AND key = ?",
+                (source_lang, target_lang, key),
+            ).fetchone()
+            if row is not None:
+                self._hit(row[0], "exact")
+                return {"kind": "exact", "source": row[1], "target": row[2], "similarity": 1.0}
+
+            best = None
+            for row_id in self._candidates(key, source_lang, target_lang):
+                source, target = self._db.execute("SELECT source, target FROM units WHERE id = ?", (row_id,)).fetchone()
+                score = similarity(key, source)
+                if best is None or score > best[0]:
+                    best = (score, row_id, source, target)
+
+            if best is None or best[0] < self.hint_similarity:
+                self.counters["misses"] += 1
+                return None
+            score, row_id, source, target = best
+            servable = self.serve_similarity is not None and score >= self.serve_similarity
+            kind = "fuzzy" if servable and same_anchors(key, source) else "hint"
+            if kind == "fuzzy":
+                self._hit(row_id, "fuzzy")
+            else:
+                self.counters["hints"] += 1
+            return {"kind": kind, "source": source, "target": target, "similarity": score}
+
+    def add(self, source, target, source_lang, target_lang, origin="model"):
+        return self.add_many([(source, target, source_lang, target_lang)], origin=origin)
+
+    def add_many(self, units, origin="import"):
+        # units: iterable of (source, target, source_lang, target_lang); returns how many were stored
+        now = time.time()
+        rows = []
+        for source, target, source_lang, target_lang in units:
+            key = normalize(source or "")
+            if key and (target or "").strip():
+                rows.append((source_lang, target_lang, key, source, target.strip(), signature(key).tobytes(), origin, now))
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO units (source_lang, target_lang, key, source, target, signature, origin, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (source_lang, target_lang, key) DO UPDATE SET "
+                "source = excluded.source, target = excluded.target, origin = excluded.origin",
+                rows,
+            )
+            self._db.commit()
+            self.counters["writes"] += len(rows)
+            # Indexes are rebuilt from the stored signatures on the next fuzzy lookup
+            for pair in {(r[0], r[1]) for r in rows}:
+                self._indexes.pop(pair, None)
+        return len(rows)
+
+    def units(self, source_lang=None, target_lang=None):
+        query, args = "SELECT source_lang, target_lang, source, target FROM units", []
+        filters = [(col, value) for col, value in (("source_lang", source_lang), ("target_lang", target_lang)) if value]
+        if filters:
+            query += " WHERE " + " AND ".join(f"{col} = ?" for col, _ in filters)
+            args = [value for _, value in filters]
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id", args).fetchall()
+        return [{"source_lang": s, "target_lang": t, "source": src, "target": tgt} for s, t, src, tgt in rows]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM units")
+            self._db.commit()
+            self._indexes.clear()
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM units").fetchone()[0]
+            stats = dict(self.counters)
+        lookups = stats["exact"] + stats["fuzzy"] + stats["hints"] + stats["misses"]
+        stats.update(units=count, reuse_rate=(stats["exact"] + stats["fuzzy"]) / lookups if lookups else 0.0)
+        return stats
+
+    def _hit(self, row_id, kind):
+        self._db.execute("UPDATE units SET hits = hits + 1 WHERE id = ?", (row_id,))
+        self._db.commit()
+        self.counters[kind] += 1
+
+    def _candidates(self, key, source_lang, target_lang):
+        index = self._indexes.get((source_lang, target_lang))
+        if index is None:
+            index = {}
+            for row_id, sig in self._db.execute(
+                "SELECT id, signature FROM units WHERE source_lang = ? AND target_lang = ?", (source_lang, target_lang)
+            ):
+                for band in _bands(np.frombuffer(sig, dtype=np.uint32)):
+                    index.setdefault(band, set()).add(row_id)
+            self._indexes[(source_lang, target_lang)] = index
+        found = set()
+        for band in _bands(signature(key)):
+            found |= index.get(band, set())
+        return found
+
+    # ---------------------------
+    # Import / export
+    # ---------------------------
+    def export_jsonl(self, source_lang=None, target_lang=None):
+        return "".join(json.dumps(u, ensure_ascii=False) + "\n" for u in self.units(source_lang, target_lang))
+
+    def import_jsonl(self, data):
+        # One {"source_lang", "target_lang", "source", "target"} object per line; languages as names or codes
+        if isinstance(data, bytes):
+            data = data.decode("utf-8-sig")
+        units = []
+        for number, line in enumerate(data.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+                units.append((row["source"], row["target"], language_name(row["source_lang"]),
+                              language_name(row["target_lang"])))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Line {number}: expected source_lang, target_lang, source and target ({e})")
+        return self.add_many(units)
+
+    def export_tmx(self, source_lang=None, target_lang=None):
+        units = self.units(source_lang, target_lang)
+        source_codes = {language_code(u["source_lang"]) for u in units}
+        tmx = ET.Element("tmx", version="1.4")
+        ET.SubElement(tmx, "header", {
+            "creationtool": "genai-simple-app", "creationtoolversion": "1.0", "segtype": "paragraph",
+            "o-tmf": "sqlite", "adminlang": "en", "datatype": "plaintext",
+            "srclang": source_codes.pop() if len(source_codes) == 1 else "*all*",
+        })
+        body = ET.SubElement(tmx, "body")
+        for unit in units:
+            tu = ET.SubElement(body, "tu")
+            for lang, text in ((unit["source_lang"], unit["source"]), (unit["target_lang"], unit["target"])):
+                tuv = ET.SubElement(tu, "tuv", {_XML_LANG: language_code(lang)})
+                ET.SubElement(tuv, "seg").text = text
+        out = io.BytesIO()
+        ET.ElementTree(tmx).write(out, encoding="utf-8", xml_declaration=True)
+        return out.getvalue()
+
+    def import_tmx(self, data):
+        # Each <tu> pairs its source variant (the header srclang, else the first <tuv>) with every other variant
+        try:
+            root = ET.fromstring(data)
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid TMX: {e}")
+        header = root.find("header")
+        srclang = (header.get("srclang") if header is not None else None) or "*all*"
+        units = []
+        for tu in root.iter("tu"):
+            variants = []
+            for tuv in tu.findall("tuv"):
+                seg = tuv.find("seg")
+                lang = tuv.get(_XML_LANG) or tuv.get("lang")
+                if seg is not None and lang:
+                    variants.append((lang, "".join(seg.itertext())))
+            if len(variants) < 2:
+                continue
+            source = next((v for v in variants if v[0].lower() == srclang.lower()), variants[0])
+            for lang, text in variants:
+                if (lang, text) != source:
+                    units.append((source[1], text, language_name(source[0]), language_name(lang)))
+        return self.add_many(units)
+
+
+_default_memory = None
+_default_lock = threading.Lock()
+
+
+def default_memory():
+    global _default_memory
+    with _default_lock:
+        if _default_memory is None:
+            _default_memory = TranslationMemory()
+        return _default_memory
+
+
+def set_default_memory(memory):
+    global _default_memory
+    with _default_lock:
+        _default_memory = memory
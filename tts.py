@@ -0,0 +1,251 @@
+# tts.py
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import telemetry
+
+CACHE_DIR = os.path.join(os.getenv("GENAI_CACHE_DIR", ".cache"), "tts")
+MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(500 * 1024 * 1024)))
+EVICT_EVERY = int(os.getenv("TTS_CACHE_EVICT_EVERY", "100"))       # writes between disk eviction passes
+ENGINE = os.getenv("TTS_ENGINE", "gtts")
+
+# Long text is synthesized as pieces of roughly this many characters, in parallel
+PIECE_CHARS = 200
+MAX_WORKERS = 6
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?।॥。！？])\s*")
+
+
+# ---------------------------
+# Engines
+# ---------------------------
+class GTTSEngine:
+    name = "gtts"
+    mime = "audio/mp3"
+
+    def synthesize(self, text, lang):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang).write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def concat(self, parts):
+        # MP3 frames are self-contained, so pieces can be joined byte for byte
+        return b"".join(parts)
+
+
+class EchoEngine:
+    # Local stand-in for tests and benchmarks: deterministic bytes, optional per-call latency
+    name = "echo"
+    mime = "audio/mp3"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def synthesize(self, text, lang):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return f"[{lang}]{text}".encode("utf-8")
+
+    def concat(self, parts):
+        return b"".join(parts)
+
+
+ENGINES = {"gtts": GTTSEngine, "echo": EchoEngine}
+
+
+# ---------------------------
+# Audio cache: byte-bounded LRU in memory, byte-bounded directory on disk
+# ---------------------------
+class AudioCache:
+    def __init__(self, directory=CACHE_DIR, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES,
+                 evict_every=EVICT_EVERY):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.evict_every = evict_every
+        self._writes_since_evict = 0
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return data
+        if self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))     # mtime doubles as last-access time for eviction
+            except OSError:
+                data = None
+            if data is not None:
+                with self._lock:
+                    self._remember(key, data)
+                    self.counters["disk_hits"] += 1
+                return data
+        with self._lock:
+            self.counters["misses"] += 1
+        return None
+
+    def set(self, key, data):
+        with self._lock:
+            self._remember(key, data)
+        if self.directory:
+            tmp = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+            # Eviction scans the whole directory, so it runs every `evict_every` writes rather than on each one
+            with self._lock:
+                self._writes_since_evict += 1
+                due = self._writes_since_evict >= self.evict_every
+                if due:
+                    self._writes_since_evict = 0
+            if due:
+                self._evict_disk()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, memory_items=len(self._memory), memory_bytes=self._memory_size)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key, data):
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= len(old)
+
+    def _evict_disk(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                with self._lock:
+                    self.counters["evictions"] += 1
+            except OSError:
+                pass
+
+
+# ---------------------------
+# Synthesis
+# ---------------------------
+def split_pieces(text, max_chars=PIECE_CHARS):
+    # Groups whole sentences up to max_chars; a single longer sentence stays one piece
+    pieces, current = [], ""
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+class TTSService:
+    def __init__(self, engine=None, cache=None, max_workers=MAX_WORKERS, piece_chars=PIECE_CHARS):
+        self.engine = engine or ENGINES[ENGINE]()
+        self.cache = cache if cache is not None else AudioCache()
+        self.max_workers = max_workers
+        self.piece_chars = piece_chars
+
+    def key(self, text, lang):
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{self.engine.name}\0{lang}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _piece(self, text, lang):
+        key = self.key(text, lang)
+        data = self.cache.get(key)
+        if data is None:
+            data = self.engine.synthesize(text, lang)
+            self.cache.set(key, data)
+        return data
+
+    def synthesize(self, text, lang, metrics=None):
+        metrics = {} if metrics is None else metrics
+        start = time.perf_counter()
+        key = self.key(text, lang)
+        data = self.cache.get(key)
+        if data is not None:
+            metrics.update(cached=True, pieces=0, seconds=time.perf_counter() - start)
+            return data
+
+        pieces = split_pieces(text, self.piece_chars) or [text]
+        if len(pieces) == 1:
+            parts = [self.engine.synthesize(pieces[0], lang)]
+        else:
+            # Pieces are cached on their own too, so repeated sentences are reused across texts
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pieces))) as pool:
+                parts = list(pool.map(telemetry.propagate(lambda piece: self._piece(piece, lang)), pieces))
+        data = self.engine.concat(parts)
+        self.cache.set(key, data)
+        metrics.update(cached=False, pieces=len(pieces), seconds=time.perf_counter() - start)
+        telemetry.record_stage("tts", metrics["seconds"])
+        return data
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_tts():
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            _default_service = TTSService()
+        return _default_service
+
+
+def cache_stats():
+    # None until something has been synthesized, so status panels don't build the TTS stack
+    with _default_lock:
+        return _default_service.cache.stats() if _default_service is not None else None
+
+
+def set_tts(service):
+    global _default_service
+    with _default_lock:
+        _default_service = service
+
+
+def synthesize(text, lang, metrics=None):
+    return get_tts().synthesize(text, lang, metrics=metrics)